@@ -0,0 +1,115 @@
+"""Счетчик выделений памяти CPython для бенчмарков
+
+CPython не отдает накопительный счетчик выделений (sys.getallocatedblocks и
+tracemalloc видят только живые блоки), поэтому счетчик подключается так же, как
+tracemalloc: обертками над аллокаторами доменов PYMEM_DOMAIN_MEM и PYMEM_DOMAIN_OBJ.
+Обертки собираются из C-исходника при первом вызове; нужен компилятор C и
+заголовки Python. Если собрать не удалось, available() возвращает False.
+"""
+import os
+import ctypes
+import tempfile
+import sysconfig
+import subprocess
+from typing import Optional
+
+_SOURCE = r'''
+#include <Python.h>
+
+static PyMemAllocatorEx original_mem, original_obj;
+static unsigned long long allocations_count;
+
+static void *counting_malloc(void *ctx, size_t size)
+{
+    PyMemAllocatorEx *original = (PyMemAllocatorEx *)ctx;
+    allocations_count++;
+    return original->malloc(original->ctx, size);
+}
+
+static void *counting_calloc(void *ctx, size_t nelem, size_t elsize)
+{
+    PyMemAllocatorEx *original = (PyMemAllocatorEx *)ctx;
+    allocations_count++;
+    return original->calloc(original->ctx, nelem, elsize);
+}
+
+static void *counting_realloc(void *ctx, void *ptr, size_t new_size)
+{
+    PyMemAllocatorEx *original = (PyMemAllocatorEx *)ctx;
+    if (ptr == NULL) {
+        allocations_count++;
+    }
+    return original->realloc(original->ctx, ptr, new_size);
+}
+
+static void counting_free(void *ctx, void *ptr)
+{
+    PyMemAllocatorEx *original = (PyMemAllocatorEx *)ctx;
+    original->free(original->ctx, ptr);
+}
+
+static void wrap(PyMemAllocatorDomain domain, PyMemAllocatorEx *original)
+{
+    PyMemAllocatorEx counting = {original, counting_malloc, counting_calloc, counting_realloc, counting_free};
+    PyMem_GetAllocator(domain, original);
+    PyMem_SetAllocator(domain, &counting);
+}
+
+void install(void)
+{
+    wrap(PYMEM_DOMAIN_MEM, &original_mem);
+    wrap(PYMEM_DOMAIN_OBJ, &original_obj);
+}
+
+unsigned long long allocations(void)
+{
+    return allocations_count;
+}
+'''
+
+_library: Optional[ctypes.PyDLL] = None
+_failed = False
+
+
+def _build() -> Optional[ctypes.PyDLL]:
+    """Компилирует обертки и устанавливает их в текущем процессе"""
+
+    directory = tempfile.mkdtemp(prefix='alloc_counter_')
+    source_path = os.path.join(directory, 'alloc_counter.c')
+    library_path = os.path.join(directory, 'alloc_counter.so')
+
+    with open(source_path, 'w') as source_file:
+        source_file.write(_SOURCE)
+
+    compiler = os.environ.get('CC', 'cc')
+    command = [compiler, '-shared', '-fPIC', '-O2', f"-I{sysconfig.get_paths()['include']}",
+               source_path, '-o', library_path]
+    try:
+        subprocess.run(command, check=True, capture_output=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    # PyDLL не отпускает GIL: аллокаторы можно менять только под ним
+    library = ctypes.PyDLL(library_path)
+    library.allocations.restype = ctypes.c_ulonglong
+    library.install()
+    return library
+
+
+def available() -> bool:
+    """Устанавливает счетчик при первом вызове; до tracemalloc.start, чтобы тот не снял обертки"""
+
+    global _library, _failed
+
+    if _library is None and not _failed:
+        _library = _build()
+        _failed = _library is None
+    return _library is not None
+
+
+def allocations() -> int:
+    """Накопительное число выделений (malloc, calloc и realloc нового блока)"""
+
+    if not available():
+        raise RuntimeError("Счетчик выделений недоступен: нужен компилятор C и заголовки Python")
+    return _library.allocations()
@@ -0,0 +1,107 @@
+"""Сверка частичного разбора (SoupStrainer) с полным деревом: результат, время и пиковая память
+
+Страницы берутся из архива (ARCHIVE_DIR или --archive) или из HTML-файлов:
+
+    python -m benchmarks.bench_partial_parse --archive ./archive --limit 500
+    python -m benchmarks.bench_partial_parse page1.html page2.html
+"""
+import time
+import argparse
+import tracemalloc
+from typing import Callable, Iterator, Tuple
+
+from src.core.settings import settings
+from src.parsers.category import CategoryPageParser
+from src.parsers.classifier import PageKind, classify_page
+from src.parsers.product_page import ProductPropertyParser
+from src.schemas.page import FetchedPage
+from src.scrapers.archive import PageArchive
+
+
+def iter_pages(args) -> Iterator[FetchedPage]:
+    if args.files:
+        for path in args.files:
+            with open(path, 'rb') as html_file:
+                yield FetchedPage(url=path, final_url=path, status_code=200, content=html_file.read())
+        return
+
+    archive = PageArchive(args.archive or settings.archive_dir)
+    for i, entry in enumerate(archive.latest_entries().values()):
+        if args.limit and i >= args.limit:
+            break
+        page = archive.read(entry)
+        if page is not None:
+            yield page
+
+
+def run(partial: bool, func: Callable[[], object]) -> Tuple[object, float, int]:
+    """Выполняет разбор в заданном режиме, возвращая результат, время и пик памяти"""
+
+    settings.partial_parsing = partial
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, elapsed, peak
+
+
+def parse_product(parser: ProductPropertyParser, page: FetchedPage) -> dict:
+    product = parser.parse_html(page.text, page.url).model_dump()
+    product.pop('created_at')
+    return product
+
+
+def parse_listing(parser: CategoryPageParser, page: FetchedPage) -> dict:
+    return parser._parse_listing(page).model_dump()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('files', nargs='*', help="HTML-файлы вместо архива")
+    arg_parser.add_argument('--archive', default='', help="каталог архива страниц")
+    arg_parser.add_argument('--limit', type=int, default=0)
+    args = arg_parser.parse_args()
+
+    product_parser = ProductPropertyParser()
+    category_parser = CategoryPageParser()
+
+    totals = {}
+    mismatches = 0
+
+    for page in iter_pages(args):
+        kind = classify_page(page)
+        if kind == PageKind.PRODUCT:
+            func = lambda: parse_product(product_parser, page)
+        elif kind == PageKind.LISTING:
+            func = lambda: parse_listing(category_parser, page)
+        else:
+            continue
+
+        full, full_time, full_peak = run(False, func)
+        partial, partial_time, partial_peak = run(True, func)
+
+        if full != partial:
+            mismatches += 1
+            print(f"Расхождение ({kind.value}): {page.url}")
+
+        stats = totals.setdefault(kind.value, [0, 0.0, 0.0, 0, 0])
+        stats[0] += 1
+        stats[1] += full_time
+        stats[2] += partial_time
+        stats[3] = max(stats[3], full_peak)
+        stats[4] = max(stats[4], partial_peak)
+
+    for kind, (count, full_time, partial_time, full_peak, partial_peak) in totals.items():
+        print(f"{kind:<8} страниц {count:>6}: "
+              f"время {full_time / count * 1000:.2f} -> {partial_time / count * 1000:.2f} мс/стр, "
+              f"пик памяти {full_peak / 1024:.0f} -> {partial_peak / 1024:.0f} КиБ")
+
+    print(f"Расхождений: {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""Сравнение путей построения и сериализации товаров
+
+Построение и сериализация замеряются раздельно:
+
+* конструкторы моделей - прежний путь: конструктор каждой вложенной модели;
+* model_construct - без валидации, с обходом полей в Python;
+* словари + model_validate - вложенные словари и одна валидация на товар
+  (так сейчас работает ProductPropertyParser);
+* model_dump на товар и пакетный dump через TypeAdapter
+  (так сейчас работает ProductRepository.save_products).
+
+Время - лучший из нескольких прогонов при отключенном сборщике мусора,
+выделения - накопительный счетчик (см. benchmarks/alloc_counter.py),
+память - пик tracemalloc.
+
+Запуск из корня проекта:
+
+    python -m benchmarks.bench_product_build --products 2000 --attributes 40
+"""
+import gc
+import time
+import argparse
+import tracemalloc
+from typing import Callable, List
+
+from benchmarks import alloc_counter
+from src.schemas.product import Product, Supplier, SupplierOffer, PriceInfo, Attribute, product_list_adapter
+
+
+def make_raw(index: int, attributes: int) -> dict:
+    """Данные в том виде, в котором их отдают экстракторы парсера"""
+
+    return {
+        'title': f"Ноутбук тестовый {index}",
+        'description': 'Нет данных',
+        'article': f"ART-{index:06d}",
+        'brand': 'Brand',
+        'country_of_origin': 'Китай',
+        'warranty_months': '12 мес.',
+        'category': 'Ноутбуки',
+        'attributes': [(f"Характеристика {i}", f"Значение {i}") for i in range(attributes)],
+        'price': 49990.0 + index,
+        'stock': 'В наличии',
+        'url': f"https://alecomp.ru/product-{index}/",
+    }
+
+
+def build_validated(raw: dict) -> Product:
+    """Текущий путь: конструкторы моделей с валидацией"""
+
+    offer = SupplierOffer(
+        price=[PriceInfo(qnt=1, discount=0.0, price=raw['price'])],
+        stock=raw['stock'],
+        purchase_url=raw['url']
+    )
+    return Product(
+        title=raw['title'],
+        description=raw['description'],
+        article=raw['article'],
+        brand=raw['brand'],
+        country_of_origin=raw['country_of_origin'],
+        warranty_months=raw['warranty_months'],
+        category=raw['category'],
+        attributes=[Attribute(attr_name=name, attr_value=value) for name, value in raw['attributes']],
+        suppliers=[Supplier(supplier_offers=[offer])]
+    )
+
+
+def build_constructed(raw: dict) -> Product:
+    """model_construct для каждой модели: без валидации, но с обходом полей в Python"""
+
+    offer = SupplierOffer.model_construct(
+        price=[PriceInfo.model_construct(qnt=1, discount=0.0, price=raw['price'])],
+        stock=raw['stock'],
+        purchase_url=raw['url']
+    )
+    return Product.model_construct(
+        title=raw['title'],
+        description=raw['description'],
+        article=raw['article'],
+        brand=raw['brand'],
+        country_of_origin=raw['country_of_origin'],
+        warranty_months=raw['warranty_months'],
+        category=raw['category'],
+        attributes=[Attribute.model_construct(attr_name=name, attr_value=value) for name, value in raw['attributes']],
+        suppliers=[Supplier.model_construct(supplier_offers=[offer])]
+    )
+
+
+def build_from_dicts(raw: dict) -> Product:
+    """Вложенные словари и одна валидация на товар"""
+
+    return Product.model_validate({
+        'title': raw['title'],
+        'description': raw['description'],
+        'article': raw['article'],
+        'brand': raw['brand'],
+        'country_of_origin': raw['country_of_origin'],
+        'warranty_months': raw['warranty_months'],
+        'category': raw['category'],
+        'attributes': [{'attr_name': name, 'attr_value': value} for name, value in raw['attributes']],
+        'suppliers': [{
+            'supplier_offers': [{
+                'price': [{'qnt': 1, 'discount': 0.0, 'price': raw['price']}],
+                'stock': raw['stock'],
+                'purchase_url': raw['url']
+            }]
+        }]
+    })
+
+
+def dump_each(products: List[Product]) -> List[dict]:
+    """model_dump на каждый товар (прежний ProductRepository.save_product)"""
+
+    return [product.model_dump() for product in products]
+
+
+def dump_batch(products: List[Product]) -> List[dict]:
+    """Пакетный dump через TypeAdapter (ProductRepository.save_products)"""
+
+    return product_list_adapter.dump_python(products)
+
+
+def run_stage(func: Callable, items: list, batch_size: int) -> list:
+    """Прогоняет этап пачками, как товары одной страницы категории"""
+
+    result = []
+    for start in range(0, len(items), batch_size):
+        result.extend(func(items[start:start + batch_size]))
+    return result
+
+
+def measure(name: str, func: Callable, items: list, batch_size: int, repeat: int) -> list:
+    """Время, число выделений и пиковая память одного этапа в пересчете на товар
+
+    Сборщик мусора на время замеров отключен: иначе время этапа зависит от того,
+    сколько объектов накопили предыдущие этапы.
+    """
+
+    per_product = len(items)
+    gc.collect()
+    gc.disable()
+    try:
+        # Время - лучший из нескольких прогонов
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run_stage(func, items, batch_size)
+            best = min(best, time.perf_counter() - started)
+            gc.collect()
+
+        # Выделения - отдельный прогон, без tracemalloc
+        allocations = None
+        if alloc_counter.available():
+            before = alloc_counter.allocations()
+            run_stage(func, items, batch_size)
+            allocations = alloc_counter.allocations() - before
+            gc.collect()
+
+        # Пик памяти - отдельный прогон под tracemalloc, чтобы не искажать время
+        tracemalloc.start()
+        result = run_stage(func, items, batch_size)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        gc.enable()
+
+    allocations_text = f"{allocations / per_product:>10.1f}" if allocations is not None else f"{'н/д':>10}"
+    print(f"{name:<28} {best / per_product * 1e6:>10.1f} мкс/товар "
+          f"{allocations_text} выделений/товар "
+          f"{peak / per_product / 1024:>8.1f} КиБ/товар (пик)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--attributes', type=int, default=40)
+    parser.add_argument('--batch', type=int, default=50, help="товаров в пачке (примерно товаров на странице)")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    # Счетчик ставится до первого tracemalloc.start
+    if not alloc_counter.available():
+        print("Счетчик выделений недоступен (нужен компилятор C и заголовки Python), колонка будет пустой")
+
+    raws = [make_raw(i, args.attributes) for i in range(args.products)]
+
+    print(f"Товаров: {args.products}, атрибутов на товар: {args.attributes}, товаров в пачке: {args.batch}")
+
+    print("Построение:")
+    built = [
+        measure('конструкторы моделей', lambda batch: [build_validated(raw) for raw in batch],
+                raws, args.batch, args.repeat),
+        measure('model_construct', lambda batch: [build_constructed(raw) for raw in batch],
+                raws, args.batch, args.repeat),
+        measure('словари + model_validate', lambda batch: [build_from_dicts(raw) for raw in batch],
+                raws, args.batch, args.repeat),
+    ]
+
+    print("Сериализация:")
+    products = built[0]
+    dumped = [
+        measure('model_dump на товар', dump_each, products, args.batch, args.repeat),
+        measure('TypeAdapter на пачку', dump_batch, products, args.batch, args.repeat),
+    ]
+
+    # created_at у моделей разный, сравниваем остальное
+    results = [dump_each(products) for products in built] + dumped
+    for result in results:
+        for product_dict in result:
+            product_dict.pop('created_at')
+    assert all(result == results[0] for result in results), "Пути дают разный результат"
+    print("Результаты совпадают")
+
+
+if __name__ == '__main__':
+    main()
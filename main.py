@@ -1,28 +1,93 @@
+import sys
 import asyncio
 import logging
-from src.services.parser_service import ParserService
+import argparse
+from typing import Iterator
 
+from src.core.log_config import setup_logging
+from src.core.settings import settings
 
-def setup_logging():
-    """Настройка логирования"""
 
-    logging.basicConfig(
-        level = logging.INFO,
-        format = '%(asctime)s - %(levelname)s - %(message)s',
-        handlers = [
-            logging.StreamHandler()
-        ]
-    )
+def parse_args():
+    """Разбор аргументов командной строки"""
+
+    parser = argparse.ArgumentParser(description="Парсер товаров Alecomp")
+    subparsers = parser.add_subparsers(dest='command')
+
+    subparsers.add_parser('crawl', help="полный проход по всем категориям (по умолчанию)")
+    subparsers.add_parser('daemon', help="долгоживущий режим с адаптивным переобходом товаров и категорий")
+    subparsers.add_parser('reparse', help="перепарсить архив страниц (ARCHIVE_DIR) без обращения к сайту")
+
+    category = subparsers.add_parser('category', help="спарсить одну категорию")
+    category.add_argument('url', help="ссылка на категорию")
+
+    url = subparsers.add_parser('url', help="спарсить один товар")
+    url.add_argument('url', help="ссылка на товар")
+
+    urls = subparsers.add_parser('urls', help="спарсить товары из файла со ссылками (по одной в строке)")
+    urls.add_argument('file', help="путь к файлу или '-' для стандартного ввода")
+
+    for targeted in (category, url, urls):
+        targeted.add_argument('--dry-run', action='store_true', help="не подключаться к MongoDB и ничего не сохранять")
+        targeted.add_argument('--stdout', action='store_true', help="выводить товары в stdout в формате JSON Lines")
+
+    return parser.parse_args()
+
+
+def read_urls(path: str) -> Iterator[str]:
+    """Построчно читает ссылки из файла, не загружая его целиком"""
+
+    stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        for line in stream:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
 
 async def main():
     """Главная функция для запуска парсинга"""
 
+    args = parse_args()
+
     setup_logging()
 
+    # Модули импортируются по необходимости, чтобы точечные команды запускались быстро
+    if args.command == 'reparse':
+        from src.services.reparse_service import ReparseService
+
+        # Парсеры прогоняются по сохраненным страницам в нескольких процессах
+        await ReparseService().reparse_archive()
+        return
+
+    from src.services.parser_service import ParserService
+
+    if args.command in ('category', 'url', 'urls'):
+        parser_service = ParserService(
+            save=not args.dry_run,
+            output=sys.stdout if args.stdout else None
+        )
+
+        if args.command == 'category':
+            # Точечное обновление обходит категорию целиком, даже если она не изменилась
+            await parser_service.parse_single_category(args.url, force=True)
+        elif args.command == 'url':
+            await parser_service.parse_urls([args.url])
+        else:
+            await parser_service.parse_urls(read_urls(args.file))
+        return
+
     parser_service = ParserService()
 
-    # Запуск парсинга всех категорий
-    await parser_service.start_parsing('https://alecomp.ru/')
+    if args.command == 'daemon':
+        # Переобход по расписанию до остановки процесса
+        await parser_service.run_daemon(settings.base_url)
+    else:
+        # Запуск парсинга всех категорий
+        await parser_service.start_parsing('https://alecomp.ru/')
 
 
 if __name__ == "__main__":
@@ -30,8 +95,9 @@ if __name__ == "__main__":
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
-        print("Парсинг прерван пользователем")
+        # stdout может быть занят потоком товаров (--stdout), поэтому сообщения - в stderr
+        print("Парсинг прерван пользователем", file=sys.stderr)
         logging.warning("Парсинг прерван пользователем")
     except Exception as e:
-        print(f"Критическая ошибка: {e}")
-        logging.error(f"Критическая ошибка в main: {e}")
\ No newline at end of file
+        print(f"Критическая ошибка: {e}", file=sys.stderr)
+        logging.error(f"Критическая ошибка в main: {e}")
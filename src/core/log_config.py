@@ -0,0 +1,128 @@
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+
+from src.core.settings import settings
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись как одну строку JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+
+        progress = getattr(record, 'progress_summary', None)
+        if progress is not None:
+            data['progress'] = progress
+
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+
+        return json.dumps(data, ensure_ascii=False)
+
+
+class ProgressAggregator(logging.Filter):
+    """Сворачивает поштучные сообщения (с полем progress) в периодическую сводку"""
+
+    def __init__(self, interval: float):
+        super().__init__()
+        self.interval = interval
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, 'progress', None)
+        if key is None:
+            return True
+
+        with self._lock:
+            self._counts[key] += getattr(record, 'progress_count', 1)
+            if time.monotonic() - self._started < self.interval:
+                return False
+
+            summary, elapsed = self._take()
+
+        # Вместо поштучного сообщения отдаем сводку за интервал
+        record.msg = self.format_summary(summary, elapsed)
+        record.args = None
+        record.progress_summary = summary
+        return True
+
+    def _take(self):
+        now = time.monotonic()
+        summary, elapsed = dict(self._counts), now - self._started
+        self._counts.clear()
+        self._started = now
+        return summary, elapsed
+
+    def flush(self, logger: logging.Logger):
+        """Выводит остаток счетчиков, например при завершении работы"""
+
+        with self._lock:
+            if not self._counts:
+                return
+            summary, elapsed = self._take()
+
+        logger.info(self.format_summary(summary, elapsed), extra={'progress_summary': summary})
+
+    @staticmethod
+    def format_summary(summary: dict, elapsed: float) -> str:
+        parts = [f"{key} {count} ({count / max(elapsed, 1e-9):.1f}/с)" for key, count in sorted(summary.items())]
+        return f"Прогресс за {elapsed:.0f} с: " + ', '.join(parts)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Передает запись в очередь без форматирования в вызывающем потоке"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging():
+    """Настройка логирования"""
+
+    formatter = JsonFormatter() if settings.log_json else logging.Formatter(LOG_FORMAT)
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    root.setLevel(settings.log_level.upper())
+
+    if not settings.log_queue:
+        root.handlers = [stream_handler]
+        return
+
+    # Запись и форматирование выполняются в фоновом потоке, event loop только кладет запись в очередь
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+
+    aggregator = None
+    if settings.log_progress_interval > 0:
+        aggregator = ProgressAggregator(settings.log_progress_interval)
+        queue_handler.addFilter(aggregator)
+
+    root.handlers = [queue_handler]
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+
+    def shutdown():
+        if aggregator is not None:
+            aggregator.flush(logging.getLogger(__name__))
+        listener.stop()
+
+    atexit.register(shutdown)
@@ -1,3 +1,5 @@
+from typing import List
+
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
@@ -8,6 +10,59 @@ class Settings(BaseSettings):
     mongo_url: str = Field(default="mongodb://127.0.0.1:27017/")
     db_name: str = Field(default="Alecomp")
     collection_name: str = Field(default="products")
+    categories_collection_name: str = Field(default="categories")
+    schedule_collection_name: str = Field(default="schedule")
+    category_tree_collection_name: str = Field(default="category_tree")
+    migrations_collection_name: str = Field(default="migrations")
+
+    # Обход дерева категорий: параллельность, глубина и срок жизни закешированных узлов
+    category_discovery_concurrency: int = Field(default=5)
+    category_max_depth: int = Field(default=5)
+    category_tree_ttl_hours: float = Field(default=24)
+
+    # Сколько первых страниц категории сверяем по отпечатку
+    category_probe_pages: int = Field(default=2)
+    # Через сколько дней неизменную категорию всё равно обходим полностью
+    category_reverify_days: float = Field(default=7)
+
+    # Логирование: уровень, фоновая очередь, JSON и интервал сводок прогресса (0 - без сводок)
+    log_level: str = Field(default="INFO")
+    log_queue: bool = Field(default=False)
+    log_json: bool = Field(default=False)
+    log_progress_interval: float = Field(default=10)
+
+    # Каталог архива загруженных страниц (пусто - архив не ведется) и параметры перепарсинга
+    archive_dir: str = Field(default="")
+    reparse_workers: int = Field(default=0)
+    reparse_chunk_size: int = Field(default=200)
+
+    # Атрибуты, для которых строятся составные индексы (категория + атрибут + бренд)
+    indexed_attributes: List[str] = Field(default_factory=list)
+    # Запросы по товарам: размер пачки курсора и кеш повторяющихся запросов
+    query_batch_size: int = Field(default=500)
+    query_cache_ttl: float = Field(default=30)
+    query_cache_size: int = Field(default=128)
+
+    # Сколько товаров сохранять одной пачкой при парсинге по списку ссылок
+    save_batch_size: int = Field(default=50)
+
+    # Бюджет пиковой памяти процесса в МиБ (0 - не проверять), выводится в итогах прогона
+    memory_budget_mb: float = Field(default=512)
+
+    # Строить дерево только для областей страницы, которые читают парсеры
+    partial_parsing: bool = Field(default=True)
+
+    # Лимит запросов к сайту в час (0 - без ограничений)
+    requests_per_hour: int = Field(default=0)
+
+    # Режим демона: лимит запросов и границы интервалов переобхода
+    daemon_requests_per_hour: int = Field(default=2000)
+    recrawl_min_hours: float = Field(default=1)
+    recrawl_max_hours: float = Field(default=168)
+    recrawl_initial_hours: float = Field(default=24)
+    recrawl_root_hours: float = Field(default=24)
+    # Сколько неудачных проверок подряд терпим, прежде чем убрать адрес из очереди
+    recrawl_max_failures: int = Field(default=5)
 
     class Config:
         env_file = ".env"
@@ -15,4 +70,4 @@ class Settings(BaseSettings):
         case_sensitive = False
 
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
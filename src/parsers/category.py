@@ -1,13 +1,28 @@
 import re
+import hashlib
 import logging
-from typing import List
+from typing import AsyncIterator, Dict, List, Optional, Set
 
 from bs4 import BeautifulSoup
 
+from src.parsers.classifier import PageKind, classify_page, is_moved
+from src.parsers.soup import build_soup, class_strainer
+from src.schemas.category import ListingPage
+from src.schemas.page import FetchedPage
 from src.scrapers.scraper import PageScraper
 
 logger = logging.getLogger(__name__)
 
+# Области страницы категории, которые читает парсер: карточки товаров и кнопка следующего блока пагинации
+LISTING_STRAINER = class_strainer([
+    'ty-compact-list__item',
+    'ty-compact-list__title',
+    'ty-pagination__range',
+])
+
+# Номер страницы в ссылке вида .../page-N/
+PAGE_NUMBER_RE = re.compile(r'/page-(\d+)/?$')
+
 
 class CategoryPageParser:
     """Парсер ссылок на товары с детектором страниц ошибок"""
@@ -15,59 +30,47 @@ class CategoryPageParser:
     def __init__(self):
         self.scraper = PageScraper()
 
-    async def get_page_count(self, url: str) -> int:
-        """Определяет количество страниц по детектору ошибок"""
+    async def iter_listing_pages(self, url: str,
+                                 known: Optional[Dict[str, ListingPage]] = None) -> AsyncIterator[ListingPage]:
+        """Отдает страницы категории по мере обнаружения, загружая каждую один раз
 
-        logger.debug(f"Определение количества страниц для: {url}")
+        known - уже загруженные страницы (например, при сверке отпечатков), их повторно не запрашиваем.
+        """
 
-        # Сначала смотрим на первую страницу
-        html = await self.scraper.scrape_page(url)
-        if not html:
-            return 1
+        known = known or {}
 
-        soup = BeautifulSoup(html, 'html.parser')
+        # Первая страница определяет видимую пагинацию
+        first_page = known.get(url) or await self.get_listing_page(url)
+        if first_page is None:
+            return
 
-        # Получаем товары с первой страницы для проверки
-        first_page_products = self._extract_products_urls_from_soup(soup)
-        if not first_page_products:
-            logger.info("На первой странице товары не найдены")
-            return 1
+        yield first_page
 
-        # Ищем видимые номера страниц в пагинации
-        page_numbers = []
+        if not first_page.product_links:
+            logger.info("На первой странице товары не найдены")
+            return
 
-        pattern = r'page-(\d+)'
-        matches = re.findall(pattern, html)
-        for match in matches:
-            try:
-                page_numbers.append(int(match))
-            except ValueError:
-                continue
+        logger.debug(f"Максимальная видимая страница: page-{first_page.last_visible_page}")
 
-        if page_numbers:
-            visible_max = max(page_numbers)
-            logger.debug(f"Максимальная видимая страница: page-{visible_max}")
-        else:
-            logger.info("Пагинация не найдена, возвращаем 1 страницу")
-            return 1
+        for page_number in range(2, first_page.last_visible_page + 1):
+            page_url = self.build_page_url(url, page_number)
+            page = known.get(page_url) or await self.get_listing_page(page_url)
 
-        # Проверяем наличие кнопки следующего блока
-        next_block_button = soup.find( ['div', 'a'],
-                                      class_='cm-history ty-pagination__item hidden-phone ty-pagination__range cm-ajax')
+            # Незагрузившуюся страницу отдаем пустой, чтобы вызывающий знал о пропуске
+            yield page if page is not None else ListingPage(url=page_url)
 
-        if not next_block_button:
-            # Если нет кнопки следующего блока и диапазонов - берем максимальную видимую
-            total_pages = visible_max
-            logger.info(f"Следующий блок страниц не найден. Всего страниц: {total_pages}")
-            return total_pages
+        if not first_page.has_next_block:
+            logger.info(f"Следующий блок страниц не найден. Всего страниц: {first_page.last_visible_page}")
+            return
 
         # Если есть индикатор дополнительных страниц - ищем конец методом детектора ошибок
         logger.info("Найден индикатор дополнительных страниц, ищем конец по страницам ошибок")
 
-        return await self._find_last_page_by_errors(url, visible_max)
+        async for page in self._iter_pages_after(url, first_page.last_visible_page):
+            yield page
 
-    async def _find_last_page_by_errors(self, url: str, start_from: int) -> int:
-        """Находит последнюю страницу по детектору страниц ошибок"""
+    async def _iter_pages_after(self, url: str, start_from: int) -> AsyncIterator[ListingPage]:
+        """Перебирает страницы после видимого блока, пока детектор страниц ошибок не найдет конец"""
 
         current_page = start_from + 1 # Номер проверяемой страницы
         last_valid_page = start_from # Номер последней подтвержденной валидной страницы
@@ -76,46 +79,52 @@ class CategoryPageParser:
         max_checks = 200  # Лимит количества проверенных страниц
 
         checks_made = 0 # Счётчик общего количества уже проверенных страниц
-        base_url = url.rstrip('/')
 
         while current_page <= 1000 and checks_made < max_checks and consecutive_errors < max_consecutive_errors:
-            test_url = f"{base_url}/page-{current_page}/"
+            test_url = self.build_page_url(url, current_page)
             logger.debug(f"Проверяем страницу page-{current_page}")
 
             try:
-                test_html = await self.scraper.scrape_page(test_url)
+                test_page = await self.scraper.fetch(test_url)
                 checks_made += 1
 
-                if not test_html:
+                if not test_page:
                     logger.debug(f"Страница page-{current_page} недоступна")
                     consecutive_errors += 1
                     current_page += 1
                     continue
 
                 # Проверяем длину ответа
-                if len(test_html) < 10000:
-                    logger.debug(f"Страница page-{current_page} слишком короткая ({len(test_html)} символов)")
+                if len(test_page.content) < 10000:
+                    logger.debug(f"Страница page-{current_page} слишком короткая ({len(test_page.content)} байт)")
                     consecutive_errors += 1
                     current_page += 1
                     continue
 
-                test_soup = BeautifulSoup(test_html, 'html.parser')
+                if self._is_past_last_page(test_page):
+                    logger.debug(f"Страница page-{current_page} перенаправлена на {test_page.final_url}")
+                    consecutive_errors += 1
+                    current_page += 1
+                    continue
 
-                # Основная проверка - является ли страница страницей ошибки
-                if self._is_error_page(test_soup):
-                    logger.debug(f"Страница page-{current_page} является страницей ошибки")
+                # Основная проверка по сырому HTML - дерево строим только для списков товаров
+                page_kind = classify_page(test_page)
+                if page_kind != PageKind.LISTING:
+                    logger.debug(f"Страница page-{current_page} не является списком товаров ({page_kind.value})")
                     consecutive_errors += 1
                     current_page += 1
                     continue
 
-                # Проверяем наличие товаров на странице
-                current_page_products = self._extract_products_urls_from_soup(test_soup)
+                listing_page = self._parse_listing(test_page)
+                del test_page
 
-                if current_page_products:
-                    # Есть товары - страница валидная
+                # Проверяем наличие товаров на странице
+                if listing_page.product_links:
+                    # Есть товары - страница валидная, сразу отдаем ее на обработку
                     last_valid_page = current_page
                     consecutive_errors = 0  # Сбрасываем счетчик ошибок
-                    logger.debug(f"Страница page-{current_page} содержит {len(current_page_products)} товаров")
+                    logger.debug(f"Страница page-{current_page} содержит {len(listing_page.product_links)} товаров")
+                    yield listing_page
                 else:
                     # Нет товаров на странице - возможная ошибка
                     logger.debug(f"Страница page-{current_page} не содержит товаров")
@@ -130,74 +139,7 @@ class CategoryPageParser:
         if consecutive_errors >= max_consecutive_errors:
             logger.info(f"Остановлено после {consecutive_errors} подряд идущих ошибок")
 
-        total_pages = last_valid_page
-        logger.info(f"Найдено страниц: {total_pages} (до page-{last_valid_page})")
-        return total_pages
-
-    def _is_error_page(self, soup: BeautifulSoup) -> bool:
-        """Проверяет, является ли страница страницей ошибки"""
-
-        # Проверяем наличие блока ty-exception
-        exception_block = soup.find('div', class_='ty-exception')
-        if exception_block:
-            logger.debug("Найден блок ty-exception => это страница ошибки")
-            return True
-
-        # Проверяем заголовок страницы
-        title = soup.find('title')
-        if title:
-            title_text = title.get_text().strip().lower()
-            error_titles = [
-                'страница находится по новому адресу',
-                'страница не найдена',
-                '404',
-                'not found',
-                'ошибка'
-            ]
-            for error_title in error_titles:
-                if error_title in title_text:
-                    logger.debug(f"Ошибка в заголовке: '{title_text}'")
-                    return True
-
-        # Проверяем текст заголовка h1
-        h1_title = soup.find('h1', class_='ty-exception__title')
-        if h1_title:
-            h1_text = h1_title.get_text().strip().lower()
-            if any(phrase in h1_text for phrase in [
-                'Страница товара переехала на новый адрес.',
-                'страница товара переехала',
-                'переехала на новый адрес',
-                'не найдена'
-            ]):
-                logger.debug(f"Ошибка в H1: '{h1_text}'")
-                return True
-
-        # Проверяем meta robots на noindex (признак служебной страницы)
-        meta_robots = soup.find('meta', attrs={'name': 'robots'})
-        if meta_robots:
-            content = meta_robots.get('content', '').lower()
-            if 'noindex' in content:
-                logger.debug("Найден meta robots noindex")
-                return True
-
-        # Проверяем отсутствие основного контента товаров
-        product_blocks = soup.find_all('div', class_='ty-compact-list__title')
-        if not product_blocks:
-            # Дополнительно проверяем, что это именно ошибка, а не пустая категория
-            page_text = soup.get_text().lower()
-            error_phrases = [
-                'переехала',
-                'новому адресу',
-                '404',
-                'не найдена',
-                'извините за неудобства'
-            ]
-            for phrase in error_phrases:
-                if phrase in page_text:
-                    logger.debug(f"Отсутствует контент товаров + найдена фраза ошибки: '{phrase}'")
-                    return True
-
-        return False
+        logger.info(f"Найдено страниц: {last_valid_page} (до page-{last_valid_page})")
 
     def _extract_products_urls_from_soup(self, soup: BeautifulSoup) -> List[str]:
         """Извлекает список URL товаров из BeautifulSoup объекта"""
@@ -213,42 +155,102 @@ class CategoryPageParser:
                     product_links.add(href)
         return sorted(list(product_links))
 
-    async def create_page_links(self, url: str) -> List[str]:
-        """Создает ссылки на все страницы категории"""
+    def _is_past_last_page(self, page: FetchedPage) -> bool:
+        """Редирект со страницы page-N (N > 1) на другой номер означает, что такой страницы нет.
 
-        pages = []
-        page_count = await self.get_page_count(url)
+        Остальные редиректы загружаем как обычно: так категория переезжает на новый адрес
+        (page-N старого адреса ведет на page-N нового).
+        """
 
-        logger.info(f"Создание ссылок для {page_count} страниц")
+        match = PAGE_NUMBER_RE.search(page.url)
+        if match is None or int(match.group(1)) <= 1 or not is_moved(page):
+            return False
 
-        base_url = url.rstrip('/')
+        final_match = PAGE_NUMBER_RE.search(page.final_url)
+        return final_match is None or final_match.group(1) != match.group(1)
 
-        for page_number in range(1, page_count + 1):
-            if page_number == 1:
-                pages.append(url)
-            else:
-                pages.append(f"{base_url}/page-{page_number}/")
+    def build_page_url(self, url: str, page_number: int) -> str:
+        """Строит ссылку на страницу категории по её номеру"""
 
-        logger.debug(f"Создано ссылок на страницы: {len(pages)}")
-        return pages
+        if page_number == 1:
+            return url
 
-    async def get_product_links(self, url: str) -> List[str]:
-        """Извлекает ссылки на товары со страницы категории"""
+        return f"{url.rstrip('/')}/page-{page_number}/"
+
+    def _fingerprint_from_soup(self, soup: BeautifulSoup, page_numbers: Set[int]) -> str:
+        """Строит отпечаток страницы по порядку товаров, их ценам и пагинации"""
+
+        digest = hashlib.sha1()
+
+        for block in soup.find_all('div', {'class': 'ty-compact-list__title'}):
+            link = block.find('a', href=True)
+            if not link:
+                continue
+
+            item = block.find_parent('div', class_='ty-compact-list__item') or block.parent
+            price = item.find('span', class_='ty-price-num') if item else None
+            price_text = price.get_text(strip=True) if price else ''
+
+            digest.update(f"{link['href']}|{price_text}\n".encode())
+
+        digest.update(','.join(map(str, sorted(page_numbers))).encode())
+
+        return digest.hexdigest()
+
+    def _parse_listing(self, page: FetchedPage) -> ListingPage:
+        """Разбирает загруженную страницу категории и сразу освобождает дерево"""
+
+        html = page.text
+        soup = build_soup(html, LISTING_STRAINER)
+
+        # Видимые номера страниц в пагинации
+        page_numbers = {int(match) for match in re.findall(r'page-(\d+)', html)}
+
+        # Кнопка следующего блока страниц
+        next_block_button = soup.find(['div', 'a'],
+                                      class_='cm-history ty-pagination__item hidden-phone ty-pagination__range cm-ajax')
+
+        listing_page = ListingPage(
+            url=page.url,
+            product_links=self._extract_products_urls_from_soup(soup),
+            fingerprint=self._fingerprint_from_soup(soup, page_numbers),
+            last_visible_page=max(page_numbers, default=1),
+            has_next_block=bool(page_numbers) and next_block_button is not None
+        )
+
+        soup.decompose()
+        return listing_page
+
+    async def get_listing_page(self, url: str) -> Optional[ListingPage]:
+        """Загружает страницу категории вместе с ее отпечатком"""
 
         logger.debug(f"Извлечение товаров с: {url}")
 
-        html = await self.scraper.scrape_page(url)
-        if not html:
-            return []
+        page = await self.scraper.fetch(url)
+        if not page:
+            return None
 
-        soup = BeautifulSoup(html, 'html.parser')
+        if self._is_past_last_page(page):
+            logger.info(f"Страница {url} перенаправлена на {page.final_url}, пропускаем")
+            return ListingPage(url=url)
 
-        # Проверяем, не является ли страница страницей ошибки
-        if self._is_error_page(soup):
-            logger.warning(f"Страница {url} является страницей ошибки, пропускаем")
-            return []
+        # Проверяем, не является ли страница страницей ошибки, до построения дерева
+        page_kind = classify_page(page)
+        if page_kind != PageKind.LISTING:
+            logger.info(f"Страница {url} не является списком товаров ({page_kind.value}), пропускаем")
+            return ListingPage(url=url)
+
+        listing_page = self._parse_listing(page)
+
+        logger.info("Найдено товаров: %d", len(listing_page.product_links),
+                    extra={"progress": "ссылок на товары", "progress_count": len(listing_page.product_links)})
+        return listing_page
 
-        products_list = self._extract_products_urls_from_soup(soup)
+    async def get_product_links(self, url: str) -> List[str]:
+        """Извлекает ссылки на товары со страницы категории"""
+
+        listing_page = await self.get_listing_page(url)
+        if listing_page is None:
+            return []
 
-        logger.info(f"Найдено товаров: {len(products_list)}")
-        return products_list
\ No newline at end of file
+        return listing_page.product_links
@@ -0,0 +1,88 @@
+import re
+import logging
+from enum import Enum
+from urllib.parse import urlsplit
+
+from src.schemas.page import FetchedPage
+
+logger = logging.getLogger(__name__)
+
+
+class PageKind(str, Enum):
+    PRODUCT = 'product'
+    LISTING = 'listing'
+    ERROR = 'error'
+
+
+# Все признаки ищутся одним проходом по байтам ответа, без построения дерева
+_MARKERS = re.compile('|'.join([
+    # Блок ty-exception - страница ошибки CS-Cart
+    r'(?P<exception>class="[^"]*\bty-exception\b)',
+    # meta robots noindex - служебная страница
+    r'''(?P<noindex><meta(?=[^>]*name=["']robots["'])[^>]*noindex)''',
+    # Ошибка в заголовке страницы
+    r'(?P<error_title><title[^>]*>[^<]*?(?:404|[Nn]ot [Ff]ound|не найдена|новому адресу|шибка))',
+    # Карточка товара и список товаров категории
+    r'(?P<product>class="[^"]*\bty-product-block-title\b)',
+    r'(?P<listing>class="[^"]*\bty-compact-list__title\b)',
+]).encode('utf-8'))
+
+_ERROR_MARKERS = {'exception', 'noindex'}
+
+# Признаки полезного содержимого: при них заголовок на ошибку не проверяется,
+# иначе карточки вроде "HP LaserJet Pro M404dn" отсекались бы как страницы ошибок
+_CONTENT_MARKERS = {'product', 'listing'}
+
+
+def is_moved(page: FetchedPage) -> bool:
+    """Проверяет, привел ли редирект на другой адрес.
+
+    Сам по себе переезд страницу не бракует (категории и товары переезжают на новые
+    адреса), поэтому classify_page его не учитывает - решают вызывающие.
+    """
+
+    return page.redirected and not _same_location(page.url, page.final_url)
+
+
+def _same_location(requested: str, final: str) -> bool:
+    """Редирект только на другой протокол или слеш в конце не считается переездом"""
+
+    requested_parts = urlsplit(requested)
+    final_parts = urlsplit(final)
+
+    return (requested_parts.netloc == final_parts.netloc and
+            requested_parts.path.rstrip('/') == final_parts.path.rstrip('/') and
+            requested_parts.query == final_parts.query)
+
+
+def find_markers(content: bytes) -> set:
+    """Возвращает набор признаков, найденных в сыром HTML"""
+
+    return {match.lastgroup for match in _MARKERS.finditer(content)}
+
+
+def classify_page(page: FetchedPage) -> PageKind:
+    """Определяет тип страницы по статусу, редиректам и сырому HTML"""
+
+    if page.status_code >= 400:
+        logger.debug(f"Статус {page.status_code}: {page.url}")
+        return PageKind.ERROR
+
+    markers = find_markers(page.content)
+
+    error_markers = markers & _ERROR_MARKERS
+    if 'error_title' in markers and not markers & _CONTENT_MARKERS:
+        error_markers.add('error_title')
+
+    if error_markers:
+        logger.debug(f"Признаки страницы ошибки {sorted(error_markers)}: {page.url}")
+        return PageKind.ERROR
+
+    if 'product' in markers:
+        return PageKind.PRODUCT
+
+    if 'listing' in markers:
+        return PageKind.LISTING
+
+    # Ни товара, ни списка товаров - извлекать нечего
+    return PageKind.ERROR
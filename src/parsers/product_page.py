@@ -4,12 +4,25 @@ from typing import List, Optional
 
 from bs4 import BeautifulSoup
 
+from src.parsers.classifier import PageKind, classify_page
+from src.parsers.soup import build_soup, class_strainer
 from src.scrapers.scraper import PageScraper
-from src.schemas.product import Product, Supplier, SupplierOffer, PriceInfo, Attribute
+from src.schemas.product import Product
 
 
 logger = logging.getLogger(__name__)
 
+# Области карточки товара, которые читают экстракторы
+PRODUCT_STRAINER = class_strainer([
+    'ty-product-block-title',
+    'ty-product-block__sku',
+    'ty-features-list',
+    'ty-price',
+    'product-list-field',
+    'ty-breadcrumbs',
+    'characteristicBox',
+])
+
 
 class ProductPropertyParser:
     """Парсер для извлечения информации о товаре"""
@@ -20,14 +33,25 @@ class ProductPropertyParser:
     async def parse_product(self, url: str) -> Optional[Product]:
         """Парсит страницу товара, возвращая объект Product"""
 
-        logger.info(f"Парсинг товара: {url}")
+        logger.info("Парсинг товара: %s", url, extra={"progress": "товаров"})
 
-        html = await self.scraper.scrape_page(url)
-        if not html:
+        page = await self.scraper.fetch(url)
+        if not page:
             logger.error(f"Не удалось получить HTML: {url}")
             return None
 
-        soup = BeautifulSoup(html, "html.parser")
+        # Страницы ошибок и редиректы отсекаем до построения дерева
+        page_kind = classify_page(page)
+        if page_kind != PageKind.PRODUCT:
+            logger.warning(f"Страница {url} не является карточкой товара ({page_kind.value})")
+            return None
+
+        return self.parse_html(page.text, url)
+
+    def parse_html(self, html: str, url: str) -> Optional[Product]:
+        """Извлекает товар из уже загруженного HTML (используется и при перепарсинге архива)"""
+
+        soup = build_soup(html, PRODUCT_STRAINER)
 
         # Извлекаем основную информацию о товаре
         title = self._extract_title(soup)
@@ -41,17 +65,21 @@ class ProductPropertyParser:
         attributes = self._extract_attributes(soup)
         suppliers = self._extract_supplier_info(soup, url)
 
-        return Product(
-            title=title,
-            description = description,
-            article=article,
-            brand=brand,
-            country_of_origin=country_of_origin,
-            warranty_months=warranty_months,
-            category=category,
-            attributes=attributes,
-            suppliers=suppliers
-        )
+        # Все извлечено в строки - дерево больше не нужно
+        soup.decompose()
+
+        # Вложенные модели передаем словарями: вся валидация проходит одним вызовом
+        return Product.model_validate({
+            'title': title,
+            'description': description,
+            'article': article,
+            'brand': brand,
+            'country_of_origin': country_of_origin,
+            'warranty_months': warranty_months,
+            'category': category,
+            'attributes': attributes,
+            'suppliers': suppliers
+        })
 
     def _extract_title(self, soup: BeautifulSoup) -> str:
         """Извлекает название товара"""
@@ -225,7 +253,7 @@ class ProductPropertyParser:
 
         return "Нет данных"
 
-    def _extract_attributes(self, soup: BeautifulSoup) -> List[Attribute]:
+    def _extract_attributes(self, soup: BeautifulSoup) -> List[dict]:
         """Извлекает атрибуты товара, избегая дублирования"""
 
         attributes = []
@@ -261,35 +289,36 @@ class ProductPropertyParser:
                         if not value.strip() or cells[0].find('b') or name.endswith('характеристики'):
                             continue
 
-                        attributes.append(Attribute(attr_name = name, attr_value = value))
+                        attributes.append({'attr_name': name, 'attr_value': value})
                         seen_attributes.add(name_lower)
 
-                        logger.debug(f"Добавлен атрибут: {name} = {value}")
+                        logger.debug("Добавлен атрибут: %s = %s", name, value)
 
-        logger.info(f"Извлечено атрибутов: {len(attributes)}")
+        logger.info("Извлечено атрибутов: %d", len(attributes),
+                    extra={"progress": "атрибутов", "progress_count": len(attributes)})
         return attributes
 
-    def _extract_supplier_info(self, soup: BeautifulSoup, page_url: str) -> List[Supplier]:
+    def _extract_supplier_info(self, soup: BeautifulSoup, page_url: str) -> List[dict]:
         """Извлекает информацию о поставщике"""
 
         price = self._extract_price(soup)
         stock = self._extract_stock(soup)
 
-        price_info = PriceInfo(qnt = 1, discount = 0, price = price)
-
-        supplier_offer = SupplierOffer(
-            price = [price_info],
-            stock = stock,
-            purchase_url = page_url
-        )
-
-        supplier = Supplier(
-            supplier_name = 'Alecomp',
-            supplier_tel = '+7 495 984-51-56',
-            supplier_address = 'г. Москва, ул. 2-ая Фрезерная, 14 стр.1Б',
-            supplier_description = 'Компьютерный центр Алекомп занимается продажей компьютеров и оргтехники с 2006 года. Нашими покупателями стали сотни компаний из различных секторов экономики. Корпоративные клиенты предъявляют особые требования к надежности поставщиков, поэтому поставщик компьютерной техники Алекомп уделяет особое внимание удобству работы и надежности поставок. В нашем компьютерном магазине собраны все актуальные товары для надежной работы офиса. Мы гарантируем быструю доставку купленного у нас компьютерного оборудования!',
-            supplier_offers = [supplier_offer]
-        )
+        price_info = {'qnt': 1, 'discount': 0, 'price': price}
+
+        supplier_offer = {
+            'price': [price_info],
+            'stock': stock,
+            'purchase_url': page_url
+        }
+
+        supplier = {
+            'supplier_name': 'Alecomp',
+            'supplier_tel': '+7 495 984-51-56',
+            'supplier_address': 'г. Москва, ул. 2-ая Фрезерная, 14 стр.1Б',
+            'supplier_description': 'Компьютерный центр Алекомп занимается продажей компьютеров и оргтехники с 2006 года. Нашими покупателями стали сотни компаний из различных секторов экономики. Корпоративные клиенты предъявляют особые требования к надежности поставщиков, поэтому поставщик компьютерной техники Алекомп уделяет особое внимание удобству работы и надежности поставок. В нашем компьютерном магазине собраны все актуальные товары для надежной работы офиса. Мы гарантируем быструю доставку купленного у нас компьютерного оборудования!',
+            'supplier_offers': [supplier_offer]
+        }
 
         return [supplier]
 
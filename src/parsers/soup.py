@@ -0,0 +1,28 @@
+from typing import Iterable, Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from src.core.settings import settings
+
+
+def class_strainer(classes: Iterable[str]) -> SoupStrainer:
+    """Пропускает в дерево только элементы с одним из указанных классов (вместе с их содержимым)"""
+
+    wanted = frozenset(classes)
+
+    def match(value) -> bool:
+        if not value:
+            return False
+        values = value.split() if isinstance(value, str) else value
+        return not wanted.isdisjoint(values)
+
+    return SoupStrainer(attrs={'class': match})
+
+
+def build_soup(html: str, strainer: Optional[SoupStrainer] = None) -> BeautifulSoup:
+    """Строит дерево только для нужных областей страницы, если включен частичный разбор"""
+
+    if strainer is not None and settings.partial_parsing:
+        return BeautifulSoup(html, 'html.parser', parse_only=strainer)
+
+    return BeautifulSoup(html, 'html.parser')
@@ -1,15 +1,21 @@
-from typing import List
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
 from urllib.parse  import urljoin
+import asyncio
 import logging
 
-from bs4 import BeautifulSoup
-
 from src.core.settings import settings
+from src.parsers.soup import build_soup, class_strainer
+from src.schemas.category import CategoryNode
 from src.scrapers.scraper import PageScraper
 
 
 logger = logging.getLogger(__name__)
 
+# Меню главной страницы и блок подкатегорий
+MENU_STRAINER = class_strainer(['ty-menu__item'])
+SUBCATEGORIES_STRAINER = class_strainer(['subcategories'])
+
 
 class StartPageParser:
     """Парсер категорий товаров"""
@@ -17,13 +23,120 @@ class StartPageParser:
     def __init__(self):
         self.scraper = PageScraper()
 
-    async def get_categories(self, url: str) -> List[str]:
+    async def get_categories(self, url: str, cached: Optional[Dict[str, CategoryNode]] = None) -> List[str]:
         """Извлекает ссылки категорий товаров"""
 
+        tree = await self.build_category_tree(url, cached)
+        return self.leaf_categories(tree)
+
+    async def iter_categories(self, url: str, cached: Optional[Dict[str, CategoryNode]] = None,
+                              tree: Optional[Dict[str, CategoryNode]] = None,
+                              on_built: Optional[Callable[[Dict[str, CategoryNode]], Awaitable[None]]] = None
+                              ) -> AsyncIterator[str]:
+        """Отдает конечные категории по мере обхода дерева; само дерево накапливается в tree.
+
+        on_built вызывается сразу по завершении обхода, не дожидаясь, пока потребитель
+        обработает все категории.
+        """
+
+        found = asyncio.Queue()
+        done = object()
+
+        async def build():
+            try:
+                built = await self.build_category_tree(url, cached, tree, on_leaf=found.put_nowait)
+                if on_built is not None:
+                    await on_built(built)
+            finally:
+                found.put_nowait(done)
+
+        task = asyncio.create_task(build())
+        try:
+            while (category_url := await found.get()) is not done:
+                yield category_url
+
+            # Пробрасываем ошибку обхода, если она была
+            await task
+        finally:
+            if not task.done():
+                task.cancel()
+
+    async def build_category_tree(self, url: str,
+                                  cached: Optional[Dict[str, CategoryNode]] = None,
+                                  tree: Optional[Dict[str, CategoryNode]] = None,
+                                  on_leaf: Optional[Callable[[str], None]] = None) -> Dict[str, CategoryNode]:
+        """Строит дерево категорий, загружая только отсутствующие в кеше и устаревшие узлы"""
+
         logger.info(f"Получение категорий с: {url}")
 
+        cached = cached or {}
+        tree = {} if tree is None else tree
+        semaphore = asyncio.Semaphore(settings.category_discovery_concurrency)
+        ttl = timedelta(hours=settings.category_tree_ttl_hours)
+        fetched = 0
+
+        async def visit(node_url: str, parent: Optional[str], depth: int):
+            nonlocal fetched
+
+            node = cached.get(node_url)
+            if node is None or node.fetched_at is None or datetime.now() - node.fetched_at >= ttl:
+                async with semaphore:
+                    if depth == 0:
+                        children = await self._fetch_top_categories(node_url)
+                    else:
+                        children = await self._fetch_subcategories(node_url)
+                fetched += 1
+
+                if children is not None:
+                    node = CategoryNode(url=node_url, children=children, fetched_at=datetime.now())
+                elif node is None:
+                    # Загрузить не удалось и кеша нет - узел станет листом и загрузится в следующий раз
+                    node = CategoryNode(url=node_url)
+                else:
+                    logger.warning(f"Используем устаревший узел из кеша: {node_url}")
+
+            tree[node_url] = node.model_copy(update={'parent': parent, 'depth': depth})
+
+            if on_leaf is not None and self._is_leaf(tree[node_url]):
+                on_leaf(node_url)
+
+            if depth < settings.category_max_depth:
+                # Дочерние узлы занимаем до запуска задач, чтобы общий подузел
+                # нескольких родителей не был загружен и обойден дважды
+                children = []
+                for child_url in node.children:
+                    if child_url not in tree:
+                        tree[child_url] = None
+                        children.append(child_url)
+
+                await asyncio.gather(*(visit(child_url, node_url, depth + 1) for child_url in children))
+
+        tree[url] = None
+        await visit(url, None, 0)
+
+        logger.info(f"Узлов в дереве категорий: {len(tree)}, загружено страниц: {fetched}")
+        return tree
+
+    def leaf_categories(self, tree: Dict[str, CategoryNode]) -> List[str]:
+        """Возвращает категории без подкатегорий (или на пределе глубины)"""
+
+        final_categories = [node.url for node in tree.values() if self._is_leaf(node)]
+
+        logger.info(f"Итоговых категорий: {len(final_categories)}")
+        return final_categories
+
+    def _is_leaf(self, node: CategoryNode) -> bool:
+        return node.depth > 0 and (not node.children or node.depth >= settings.category_max_depth)
+
+    async def _fetch_top_categories(self, url: str) -> Optional[List[str]]:
+        """Извлекает основные категории из меню главной страницы"""
+
         html = await self.scraper.scrape_page(url)
-        soup = BeautifulSoup(html, "html.parser")
+        if not html:
+            logger.warning(f"Не удалось получить HTML для: {url}")
+            return None
+
+        soup = build_soup(html, MENU_STRAINER)
 
         initial_categories = []
 
@@ -32,44 +145,43 @@ class StartPageParser:
         for block in category_blocks:
             links = block.find_all('a', href = True)
             for link in links:
-                href = link.get('href')
-                if href:
+                href = urljoin(url, link.get('href'))
+                if href not in initial_categories:
                     initial_categories.append(href)
                     logger.debug(f"Найдена начальная категория: {href}")
 
+        soup.decompose()
+
         logger.info(f"Найдено начальных категорий: {len(initial_categories)}")
+        return initial_categories
 
-        final_categories = set()
-
-        # Проверяем каждую категорию на наличие подкатегорий
-        for category_url in initial_categories:
-            logger.info(f"Проверяем категорию: {category_url}")
-
-            category_html = await self.scraper.scrape_page(category_url)
-            if not category_html:
-                logger.warning(f"Не удалось получить HTML для: {category_url}")
-                final_categories.add(category_url)
-                continue
-
-            category_soup = BeautifulSoup(category_html, "html.parser")
-
-            # Проверяем наличие "subcategories clearfix"
-            catalog_categories = category_soup.find('ul', class_ = 'subcategories clearfix')
-
-            if catalog_categories:
-                logger.info(f"Найден блок 'subcategories clearfix' в : {category_url}")
-                # Извлекаем подкатегорию вместо основной категории
-                links = catalog_categories.find_all('a', href = True)
-                for link in links:
-                    href = link.get('href')
-                    if href:
-                        final_categories.add(href)
-                        logger.debug(f"Найдена подкатегория: {href}")
-            else:
-                # Если подкатегорий нет, оставляем основную категорию
-                final_categories.add(category_url)
-                logger.debug(f"Подкатегории не найдены, оставляем: {category_url}")
+    async def _fetch_subcategories(self, category_url: str) -> Optional[List[str]]:
+        """Извлекает подкатегории из блока 'subcategories clearfix'"""
 
-        logger.info(f"Итоговых категорий: {len(final_categories)}")
+        logger.debug(f"Проверяем категорию: {category_url}")
+
+        category_html = await self.scraper.scrape_page(category_url)
+        if not category_html:
+            logger.warning(f"Не удалось получить HTML для: {category_url}")
+            return None
+
+        category_soup = build_soup(category_html, SUBCATEGORIES_STRAINER)
+
+        # Проверяем наличие "subcategories clearfix"
+        catalog_categories = category_soup.find('ul', class_ = 'subcategories clearfix')
+        if not catalog_categories:
+            logger.debug(f"Подкатегории не найдены: {category_url}")
+            category_soup.decompose()
+            return []
+
+        subcategories = []
+        for link in catalog_categories.find_all('a', href = True):
+            href = urljoin(category_url, link.get('href'))
+            if href not in subcategories:
+                subcategories.append(href)
+                logger.debug(f"Найдена подкатегория: {href}")
+
+        category_soup.decompose()
 
-        return list(final_categories)
\ No newline at end of file
+        logger.info(f"Найдено подкатегорий: {len(subcategories)} в {category_url}")
+        return subcategories
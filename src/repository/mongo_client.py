@@ -1,5 +1,4 @@
 import logging
-from pymongo import AsyncMongoClient
 from src.core.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -12,6 +11,9 @@ class MongoClient:
         self.database = None
 
     async def connect(self):
+        # pymongo импортируется только при подключении, чтобы не замедлять запуск без базы
+        from pymongo import AsyncMongoClient
+
         self.client = AsyncMongoClient(settings.mongo_url)
         # Проверяем подключение
         await self.client.admin.command('ping')
@@ -1,14 +1,51 @@
+import re
+import sys
+import json
+import time
 import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
 from src.core.settings import settings
 from src.repository.mongo_client import mongo_client
-from src.schemas.product import Product
+from src.schemas.category import CategoryNode, CategoryState
+from src.schemas.product import Product, product_list_adapter
+from src.schemas.schedule import ScheduleItem
 
 logger = logging.getLogger(__name__)
 
+# Отметка о выполненном заполнении attr_map в коллекции миграций
+ATTR_MAP_MIGRATION = "attr_map_backfill"
+
+# Поля, которые по умолчанию возвращают запросы по товарам
+DEFAULT_PRODUCT_PROJECTION = {"_id": 0, "title": 1, "article": 1, "brand": 1, "category": 1, "attr_map": 1}
+
+
+@lru_cache(maxsize=4096)
+def normalize_attribute_key(name: str) -> str:
+    """Приводит название атрибута к ключу attr_map: нижний регистр, '_' вместо пробелов, точек и '$'"""
+
+    key = re.sub(r'[\s.$]+', '_', name.strip().lower()).strip('_')
+    return sys.intern(key)
+
+
+def build_attribute_map(attributes: List[dict]) -> Dict[str, str]:
+    """Строит словарь атрибутов с нормализованными ключами"""
+
+    attr_map = {}
+    for attribute in attributes:
+        key = normalize_attribute_key(attribute["attr_name"])
+        if key and key not in attr_map:
+            attr_map[key] = attribute["attr_value"].strip()
+    return attr_map
+
 
 class ProductRepository:
     def __init__(self):
         self._collection = None
+        self._query_cache = OrderedDict()
 
     @property
     def collection(self):
@@ -16,22 +53,352 @@ class ProductRepository:
             self._collection = mongo_client.get_collection(settings.collection_name)
         return self._collection
 
+    async def ensure_indexes(self):
+        """Создает индексы для сохранения по артикулу и для запросов по бренду, категории и атрибутам"""
+
+        try:
+            await self.collection.create_index("article")
+            await self.collection.create_index([("category", 1), ("brand", 1)])
+            await self.collection.create_index("brand")
+            await self.collection.create_index("attr_map.$**")
+
+            for name in settings.indexed_attributes:
+                await self.collection.create_index([
+                    ("category", 1),
+                    (f"attr_map.{normalize_attribute_key(name)}", 1),
+                    ("brand", 1)
+                ])
+        except Exception as e:
+            logger.error(f"Ошибка создания индексов: {e}")
+
+        await self.backfill_attr_map()
+
+    async def backfill_attr_map(self):
+        """Один раз достраивает attr_map у товаров, сохраненных до его появления.
+
+        Запрос по отсутствию поля не использует индекс, поэтому после успешного
+        заполнения в коллекции миграций ставится отметка и повторно коллекция не сканируется.
+        """
+
+        from pymongo import UpdateOne
+
+        migrations = mongo_client.get_collection(settings.migrations_collection_name)
+
+        try:
+            if await migrations.find_one({"_id": ATTR_MAP_MIGRATION}):
+                return
+
+            cursor = self.collection.find(
+                {"attr_map": {"$exists": False}},
+                {"_id": 1, "attributes": 1},
+                batch_size=settings.query_batch_size
+            )
+
+            operations = []
+            updated = 0
+            async for document in cursor:
+                attr_map = build_attribute_map(document.get("attributes") or [])
+                operations.append(UpdateOne({"_id": document["_id"]}, {"$set": {"attr_map": attr_map}}))
+
+                if len(operations) >= settings.query_batch_size:
+                    await self.collection.bulk_write(operations, ordered=False)
+                    updated += len(operations)
+                    operations = []
+
+            if operations:
+                await self.collection.bulk_write(operations, ordered=False)
+                updated += len(operations)
+
+            await migrations.update_one(
+                {"_id": ATTR_MAP_MIGRATION},
+                {"$set": {"done_at": datetime.now(), "updated": updated}},
+                upsert=True
+            )
+            logger.info(f"Добавлен attr_map для товаров: {updated}")
+        except Exception as e:
+            logger.error(f"Ошибка заполнения attr_map: {e}")
+
+    def _to_document(self, product_dict: dict) -> dict:
+        """Дополняет товар словарем атрибутов для индексируемых запросов"""
+
+        product_dict["attr_map"] = build_attribute_map(product_dict["attributes"])
+        return product_dict
+
     async def save_product(self, product: Product):
         try:
-            product_dict = product.model_dump()
+            product_dict = self._to_document(product.model_dump())
 
-            # Проверяем по артикулу
-            existing = await self.collection.find_one({"article": product.article})
+            # Обновляем по артикулу или вставляем новый товар за один запрос
+            result = await self.collection.update_one(
+                {"article": product.article},
+                {"$set": product_dict},
+                upsert=True
+            )
 
-            if existing:
-                await self.collection.update_one(
-                    {"article": product.article},
-                    {"$set": product_dict}
-                )
-                logger.info(f"Обновлен: {product.article}")
+            if result.upserted_id is None:
+                logger.info("Обновлен: %s", product.article, extra={"progress": "сохранено"})
             else:
-                await self.collection.insert_one(product_dict)
-                logger.info(f"Сохранен: {product.article}")
+                logger.info("Сохранен: %s", product.article, extra={"progress": "сохранено"})
+
+        except Exception as e:
+            logger.error(f"Ошибка сохранения: {e}")
+
+    async def save_products(self, products: List[Product]):
+        """Сохраняет пачку товаров одной пакетной операцией"""
 
+        if not products:
+            return
+
+        try:
+            # Сериализуем весь список за один вызов
+            from pymongo import UpdateOne
+
+            product_dicts = product_list_adapter.dump_python(products)
+
+            operations = [
+                UpdateOne({"article": product_dict["article"]}, {"$set": self._to_document(product_dict)}, upsert=True)
+                for product_dict in product_dicts
+            ]
+            result = await self.collection.bulk_write(operations, ordered=False)
+
+            logger.info("Сохранено товаров: %d, обновлено: %d", result.upserted_count, result.matched_count,
+                        extra={"progress": "сохранено", "progress_count": result.upserted_count + result.matched_count})
+
+        except Exception as e:
+            logger.error(f"Ошибка пакетного сохранения: {e}")
+
+    async def save_raw_products(self, raw_products: List[dict]):
+        """Валидирует пачку сырых словарей товаров и сохраняет ее"""
+
+        try:
+            products = product_list_adapter.validate_python(raw_products)
+        except Exception as e:
+            logger.error(f"Ошибка валидации товаров: {e}")
+            return
+
+        await self.save_products(products)
+
+    async def find_products(self, category: Optional[str] = None, brand: Optional[str] = None,
+                            attributes: Optional[Dict[str, str]] = None, projection: Optional[dict] = None,
+                            limit: int = 0) -> AsyncIterator[dict]:
+        """Потоково отдает товары по категории, бренду и значениям атрибутов"""
+
+        query = {}
+        if category:
+            query["category"] = category
+        if brand:
+            query["brand"] = brand
+        for name, value in (attributes or {}).items():
+            query[f"attr_map.{normalize_attribute_key(name)}"] = value
+
+        cursor = self.collection.find(
+            query,
+            projection or DEFAULT_PRODUCT_PROJECTION,
+            limit=limit,
+            batch_size=settings.query_batch_size
+        )
+
+        async for document in cursor:
+            yield document
+
+    async def find_products_cached(self, category: Optional[str] = None, brand: Optional[str] = None,
+                                   attributes: Optional[Dict[str, str]] = None, projection: Optional[dict] = None,
+                                   limit: int = 0) -> List[dict]:
+        """То же, что find_products, но с коротким кешем для повторяющихся запросов
+
+        Возвращаемый список общий для всех попаданий в кеш, изменять его нельзя.
+        """
+
+        key = (
+            category,
+            brand,
+            tuple(sorted((normalize_attribute_key(name), value) for name, value in (attributes or {}).items())),
+            # Проекция может содержать вложенные словари ({"$slice": ...}), поэтому ключ - ее JSON
+            json.dumps(projection or {}, sort_keys=True, default=str),
+            limit
+        )
+
+        cached = self._query_cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            self._query_cache.move_to_end(key)
+            return cached[1]
+
+        result = [document async for document in self.find_products(category, brand, attributes, projection, limit)]
+
+        self._query_cache[key] = (time.monotonic() + settings.query_cache_ttl, result)
+        self._query_cache.move_to_end(key)
+        while len(self._query_cache) > settings.query_cache_size:
+            self._query_cache.popitem(last=False)
+
+        return result
+
+
+class CategoryRepository:
+    """Хранит отпечатки первых страниц категорий и время их проверки"""
+
+    def __init__(self):
+        self._collection = None
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            self._collection = mongo_client.get_collection(settings.categories_collection_name)
+        return self._collection
+
+    async def get_state(self, url: str) -> Optional[CategoryState]:
+        try:
+            document = await self.collection.find_one({"url": url})
+            if document:
+                return CategoryState.model_validate(document)
+        except Exception as e:
+            logger.error(f"Ошибка чтения состояния категории {url}: {e}")
+
+        return None
+
+    async def save_state(self, state: CategoryState):
+        try:
+            await self.collection.update_one(
+                {"url": state.url},
+                {"$set": state.model_dump()},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Ошибка сохранения состояния категории: {e}")
+
+    async def mark_checked(self, url: str):
+        try:
+            await self.collection.update_one(
+                {"url": url},
+                {"$set": {"checked_at": datetime.now()}}
+            )
+        except Exception as e:
+            logger.error(f"Ошибка обновления состояния категории: {e}")
+
+
+class CategoryTreeRepository:
+    """Кеш дерева категорий с временем загрузки каждого узла"""
+
+    def __init__(self):
+        self._collection = None
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            self._collection = mongo_client.get_collection(settings.category_tree_collection_name)
+        return self._collection
+
+    async def load_nodes(self) -> Dict[str, CategoryNode]:
+        nodes = {}
+        try:
+            async for document in self.collection.find({}, {"_id": 0}):
+                node = CategoryNode.model_validate(document)
+                nodes[node.url] = node
+        except Exception as e:
+            logger.error(f"Ошибка чтения дерева категорий: {e}")
+
+        return nodes
+
+    async def save_nodes(self, nodes: Iterable[CategoryNode]):
+        from pymongo import UpdateOne
+
+        operations = [
+            UpdateOne({"url": node.url}, {"$set": node.model_dump()}, upsert=True)
+            for node in nodes
+        ]
+        if not operations:
+            return
+
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения дерева категорий: {e}")
+
+
+class ScheduleRepository:
+    """Постоянная очередь переобхода, упорядоченная по времени следующего запуска"""
+
+    def __init__(self):
+        self._collection = None
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            self._collection = mongo_client.get_collection(settings.schedule_collection_name)
+        return self._collection
+
+    async def ensure_indexes(self):
+        try:
+            await self.collection.create_index("url", unique=True)
+            await self.collection.create_index("next_run_at")
+        except Exception as e:
+            logger.error(f"Ошибка создания индексов очереди: {e}")
+
+    async def enqueue(self, url: str, kind: str, interval_hours: float):
+        """Добавляет адрес в очередь, если его там еще нет"""
+
+        try:
+            item = ScheduleItem(url=url, kind=kind, interval_hours=interval_hours)
+            await self.collection.update_one(
+                {"url": url},
+                {"$setOnInsert": item.model_dump()},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Ошибка добавления в очередь {url}: {e}")
+
+    async def pop_due(self, lease_minutes: float = 30) -> Optional[ScheduleItem]:
+        """Забирает ближайший просроченный элемент и откладывает его на время обработки"""
+
+        now = datetime.now()
+        try:
+            document = await self.collection.find_one_and_update(
+                {"next_run_at": {"$lte": now}},
+                {"$set": {"next_run_at": now + timedelta(minutes=lease_minutes)}},
+                sort=[("next_run_at", 1)]
+            )
+        except Exception as e:
+            logger.error(f"Ошибка получения задачи из очереди: {e}")
+            return None
+
+        if document:
+            return ScheduleItem.model_validate(document)
+        return None
+
+    async def next_run_at(self) -> Optional[datetime]:
+        try:
+            document = await self.collection.find_one({}, sort=[("next_run_at", 1)])
+        except Exception as e:
+            logger.error(f"Ошибка чтения очереди: {e}")
+            return None
+
+        if document:
+            return document["next_run_at"]
+        return None
+
+    async def reschedule(self, item: ScheduleItem, signature: str, changed: bool, interval_hours: float,
+                         failures: int = 0):
+        """Сохраняет результат проверки и время следующего запуска"""
+
+        try:
+            await self.collection.update_one(
+                {"url": item.url},
+                {
+                    "$set": {
+                        "signature": signature,
+                        "interval_hours": interval_hours,
+                        "next_run_at": datetime.now() + timedelta(hours=interval_hours),
+                        "failures": failures
+                    },
+                    "$inc": {"checks": 1, "changes": int(changed)}
+                }
+            )
+        except Exception as e:
+            logger.error(f"Ошибка обновления очереди {item.url}: {e}")
+
+    async def remove(self, url: str):
+        """Убирает адрес из очереди переобхода"""
+
+        try:
+            await self.collection.delete_one({"url": url})
         except Exception as e:
-            logger.error(f"Ошибка сохранения: {e}")
\ No newline at end of file
+            logger.error(f"Ошибка удаления из очереди {url}: {e}")
@@ -0,0 +1,26 @@
+from typing import List, Optional
+from datetime import datetime
+from pydantic import BaseModel, Field
+
+
+class ListingPage(BaseModel):
+    url: str
+    product_links: List[str] = Field(default_factory=list)
+    fingerprint: str = ''
+    last_visible_page: int = 1
+    has_next_block: bool = False
+
+
+class CategoryState(BaseModel):
+    url: str
+    fingerprints: List[str] = Field(default_factory=list)
+    checked_at: datetime = Field(default_factory=datetime.now)
+    verified_at: datetime = Field(default_factory=datetime.now)
+
+
+class CategoryNode(BaseModel):
+    url: str
+    parent: Optional[str] = None
+    children: List[str] = Field(default_factory=list)
+    depth: int = 0
+    fetched_at: Optional[datetime] = None
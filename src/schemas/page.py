@@ -0,0 +1,15 @@
+from typing import Optional
+from pydantic import BaseModel
+
+
+class FetchedPage(BaseModel):
+    url: str
+    final_url: str
+    status_code: int
+    redirected: bool = False
+    content: bytes = b''
+    encoding: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
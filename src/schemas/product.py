@@ -1,5 +1,5 @@
 from typing import List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 from datetime import datetime
 
 
@@ -43,4 +43,8 @@ class Product(BaseModel):
         default_factory=lambda: datetime.now().strftime("%d.%m.%Y %H:%M")
     )
     attributes: List[Attribute] = Field(default_factory=list)
-    suppliers: List[Supplier] = Field(default_factory=list)
\ No newline at end of file
+    suppliers: List[Supplier] = Field(default_factory=list)
+
+
+# Пакетная валидация и сериализация списков товаров
+product_list_adapter = TypeAdapter(List[Product])
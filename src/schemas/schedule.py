@@ -0,0 +1,13 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+
+
+class ScheduleItem(BaseModel):
+    url: str
+    kind: str  # root | category | product
+    interval_hours: float
+    next_run_at: datetime = Field(default_factory=datetime.now)
+    signature: str = ''
+    checks: int = 0
+    changes: int = 0
+    failures: int = 0  # неудачных проверок подряд
@@ -0,0 +1,148 @@
+import os
+import gzip
+import json
+import uuid
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional
+
+from src.core.settings import settings
+from src.schemas.page import FetchedPage
+
+logger = logging.getLogger(__name__)
+
+
+class PageArchive:
+    """Append-only архив загруженных страниц в формате WARC с индексом по URL и времени загрузки
+
+    Каждая запись - отдельный gzip-блок в файле pages-ГГГГММДД.warc.gz, поэтому файлы
+    читаются обычными WARC-инструментами, а запись можно достать по смещению из index.jsonl.
+    """
+
+    index_name = 'index.jsonl'
+
+    def __init__(self, directory: str = ''):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.directory, self.index_name)
+
+    def write(self, page: FetchedPage):
+        """Дописывает страницу в архив и индекс"""
+
+        fetched_at = datetime.now(timezone.utc)
+        file_name = f"pages-{fetched_at:%Y%m%d}.warc.gz"
+        record = gzip.compress(self._build_record(page, fetched_at))
+
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+
+            with open(os.path.join(self.directory, file_name), 'ab') as warc_file:
+                offset = warc_file.tell()
+                warc_file.write(record)
+
+            entry = {
+                'url': page.url,
+                'fetched_at': fetched_at.isoformat(),
+                'status': page.status_code,
+                'file': file_name,
+                'offset': offset,
+                'length': len(record),
+            }
+            with open(self.index_path, 'a', encoding='utf-8') as index_file:
+                index_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def _build_record(self, page: FetchedPage, fetched_at: datetime) -> bytes:
+        """Собирает WARC-запись типа response"""
+
+        http_block = (
+            f"HTTP/1.1 {page.status_code}\r\n"
+            f"Content-Type: text/html; charset={page.encoding or 'utf-8'}\r\n"
+            f"Content-Length: {len(page.content)}\r\n"
+            f"\r\n"
+        ).encode('utf-8') + page.content
+
+        headers = (
+            f"WARC/1.0\r\n"
+            f"WARC-Type: response\r\n"
+            f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n"
+            f"WARC-Date: {fetched_at:%Y-%m-%dT%H:%M:%SZ}\r\n"
+            f"WARC-Target-URI: {page.url}\r\n"
+            f"X-Final-URL: {page.final_url}\r\n"
+            f"X-Redirected: {int(page.redirected)}\r\n"
+            f"Content-Type: application/http;msgtype=response\r\n"
+            f"Content-Length: {len(http_block)}\r\n"
+            f"\r\n"
+        ).encode('utf-8')
+
+        return headers + http_block + b"\r\n\r\n"
+
+    def read(self, entry: dict) -> Optional[FetchedPage]:
+        """Читает страницу по записи индекса"""
+
+        try:
+            with open(os.path.join(self.directory, entry['file']), 'rb') as warc_file:
+                warc_file.seek(entry['offset'])
+                record = gzip.decompress(warc_file.read(entry['length']))
+        except (OSError, EOFError) as e:
+            logger.error(f"Ошибка чтения архива {entry.get('url')}: {e}")
+            return None
+
+        warc_headers, _, rest = record.partition(b"\r\n\r\n")
+        headers = self._parse_headers(warc_headers)
+        block = rest[:int(headers.get('content-length', len(rest)))]
+
+        http_headers, _, content = block.partition(b"\r\n\r\n")
+        status_line, *http_lines = http_headers.decode('utf-8', errors='replace').split("\r\n")
+        charset = None
+        for line in http_lines:
+            name, _, value = line.partition(':')
+            if name.lower() == 'content-type' and 'charset=' in value:
+                charset = value.split('charset=', 1)[1].strip()
+
+        return FetchedPage(
+            url=headers.get('warc-target-uri', entry['url']),
+            final_url=headers.get('x-final-url', entry['url']),
+            status_code=int(status_line.split()[1]),
+            redirected=headers.get('x-redirected') == '1',
+            content=content,
+            encoding=charset
+        )
+
+    @staticmethod
+    def _parse_headers(raw: bytes) -> Dict[str, str]:
+        headers = {}
+        for line in raw.decode('utf-8', errors='replace').split("\r\n")[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return headers
+
+    def iter_index(self) -> Iterator[dict]:
+        """Построчно читает индекс архива"""
+
+        if not os.path.exists(self.index_path):
+            return
+
+        with open(self.index_path, encoding='utf-8') as index_file:
+            for line in index_file:
+                if line.strip():
+                    yield json.loads(line)
+
+    def latest_entries(self) -> Dict[str, dict]:
+        """Последняя загрузка каждого URL"""
+
+        latest = {}
+        for entry in self.iter_index():
+            if entry['url'] not in latest or entry['fetched_at'] >= latest[entry['url']]['fetched_at']:
+                latest[entry['url']] = entry
+        return latest
+
+
+page_archive = PageArchive(settings.archive_dir)
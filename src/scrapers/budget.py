@@ -0,0 +1,45 @@
+import time
+import asyncio
+import logging
+from collections import deque
+
+from src.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RequestBudget:
+    """Ограничивает количество запросов в час скользящим окном"""
+
+    window = 3600
+
+    def __init__(self, per_hour: int = 0):
+        self.per_hour = per_hour
+        self._timestamps = deque()
+        self._lock = asyncio.Lock()
+
+    def _drop_expired(self, now: float):
+        while self._timestamps and now - self._timestamps[0] >= self.window:
+            self._timestamps.popleft()
+
+    async def acquire(self):
+        """Ждет, пока в окне появится место для запроса"""
+
+        if self.per_hour <= 0:
+            return
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._drop_expired(now)
+
+                if len(self._timestamps) < self.per_hour:
+                    self._timestamps.append(now)
+                    return
+
+                wait = self.window - (now - self._timestamps[0])
+                logger.info(f"Лимит запросов исчерпан, ожидание {wait:.0f} с")
+                await asyncio.sleep(wait)
+
+
+request_budget = RequestBudget(settings.requests_per_hour)
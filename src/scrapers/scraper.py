@@ -1,18 +1,50 @@
 from typing import Optional
 
 import httpx
+import asyncio
 import logging
 
+from src.schemas.page import FetchedPage
+from src.scrapers.archive import page_archive
+from src.scrapers.budget import request_budget
+
 logger = logging.getLogger(__name__)
 
 
 class PageScraper:
 
-    async def scrape_page(self, url: str) -> Optional[str]:
+    async def fetch(self, url: str) -> Optional[FetchedPage]:
+        """Загружает страницу вместе со статусом ответа и сведениями о редиректах"""
+
+        await request_budget.acquire()
+
         async with httpx.AsyncClient(follow_redirects=True, timeout=30) as Client:
             try:
                 response = await Client.get(url)
-                return response.text
+                page = FetchedPage(
+                    url=url,
+                    final_url=str(response.url),
+                    status_code=response.status_code,
+                    redirected=bool(response.history),
+                    content=response.content,
+                    encoding=response.encoding
+                )
             except Exception as e:
                 logger.error(f"Ошибка при получении html: {e}")
-                return None
\ No newline at end of file
+                return None
+
+        if page_archive.enabled:
+            try:
+                # Сжатие и запись на диск выполняем вне event loop
+                await asyncio.to_thread(page_archive.write, page)
+            except Exception as e:
+                logger.error(f"Ошибка записи в архив: {e}")
+
+        return page
+
+    async def scrape_page(self, url: str) -> Optional[str]:
+        page = await self.fetch(url)
+        if page is None:
+            return None
+
+        return page.text
@@ -1,11 +1,20 @@
 import asyncio
 import logging
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Iterable, List, Optional, TextIO
 
+from src.core.settings import settings
 from src.parsers.start_page import StartPageParser
 from src.parsers.category import CategoryPageParser
 from src.parsers.product_page import ProductPropertyParser
 from src.repository.mongo_client import mongo_client
-from src.repository.repository import ProductRepository
+from src.repository.repository import ProductRepository, CategoryRepository, CategoryTreeRepository, ScheduleRepository
+from src.schemas.category import CategoryState, ListingPage
+from src.schemas.product import Product
+from src.schemas.schedule import ScheduleItem
+from src.scrapers.budget import request_budget
+from src.services.run_stats import RunStats
+from src.services.scheduler import RecrawlScheduler
 
 logger = logging.getLogger(__name__)
 
@@ -13,93 +22,285 @@ logger = logging.getLogger(__name__)
 class ParserService:
     """Сервис для парсинга товаров с сайта Лемана ПРО"""
 
-    def __init__(self):
+    def __init__(self, save: bool = True, output: Optional[TextIO] = None):
+
+        # save=False - пробный прогон без MongoDB; output - поток для вывода товаров в JSON Lines
+        self.save = save
+        self.output = output
 
         self.start_parser = StartPageParser()
         self.category_parser = CategoryPageParser()
         self.product_parser = ProductPropertyParser()
         self.repository = ProductRepository()
+        self.category_repository = CategoryRepository()
+        self.category_tree_repository = CategoryTreeRepository()
+        self.schedule_repository = ScheduleRepository()
+        self.scheduler = RecrawlScheduler()
+        self.stats = RunStats()
 
         # Задержки между запросами
         self.delay_between_requests = 0.5
         self.delay_between_categories = 2.0
 
+        # Максимальная пауза демона, когда в очереди нет просроченных задач
+        self.daemon_idle_delay = 60.0
+
     async def start_parsing(self, base_url: str = "https://lemanapro.ru/catalogue/"):
         """Запускает полный парсинг сайта"""
 
+        self.stats = RunStats()
+
         try:
             logger.info("Запуск парсинга ЛеманаПРО")
 
             # Подключаемся к MongoDB
             await mongo_client.connect()
+            await self.repository.ensure_indexes()
 
-            # Получаем список категорий
+            # Категории обрабатываются по мере обхода дерева категорий
             logger.info("Получение списка категорий")
-            categories = await self.start_parser.get_categories(base_url)
-            logger.info(f"Найдено категорий: {len(categories)}")
-
-            # Обрабатываемя каждую категорию
-            for i, category_url in enumerate(categories, 1):
-                logger.info(f"Обработка категории {i}/{len(categories)}: {category_url}")
-                await self._process_category(category_url)
+            i = 0
 
+            async for category_url in self._iter_categories(base_url):
                 # Задержка между категориями
-                if i < len(categories):
+                if i:
                     await asyncio.sleep(self.delay_between_categories)
 
+                i += 1
+                logger.info(f"Обработка категории {i}: {category_url}")
+                await self._process_category(category_url)
+
             logger.info("Парсинг завершен")
 
         except Exception as e:
             logger.error(f"Критическая ошибка в парсинге: {e}")
         finally:
+            self.stats.report()
             await mongo_client.disconnect()
 
-    async def parse_single_category(self, category_url: str):
-        """Парсит одну категорию"""
+    async def run_daemon(self, base_url: str = "https://alecomp.ru/"):
+        """Долгоживущий режим: переобходит категории и товары по адаптивному расписанию"""
+
+        request_budget.per_hour = settings.daemon_requests_per_hour
 
         try:
-            logger.info(f"Парсинг категории: {category_url}")
+            logger.info(f"Запуск демона переобхода, лимит запросов в час: {request_budget.per_hour}")
 
             # Подключаемся к MongoDB
             await mongo_client.connect()
+            await self.repository.ensure_indexes()
+            await self.schedule_repository.ensure_indexes()
+
+            # Главная страница - источник списка категорий
+            await self.schedule_repository.enqueue(base_url, 'root', settings.recrawl_root_hours)
+
+            while True:
+                try:
+                    item = await self.schedule_repository.pop_due()
+                    if item is None:
+                        await asyncio.sleep(await self._daemon_idle_delay())
+                        continue
+
+                    await self._run_schedule_item(item)
+                    await asyncio.sleep(self.delay_between_requests)
+                except Exception as e:
+                    # Временные сбои (например, потеря связи с MongoDB) не должны останавливать демон
+                    logger.error(f"Ошибка в цикле демона, повтор через {self.daemon_idle_delay:.0f} с: {e}")
+                    await asyncio.sleep(self.daemon_idle_delay)
+
+        except Exception as e:
+            logger.error(f"Критическая ошибка в демоне: {e}")
+        finally:
+            await mongo_client.disconnect()
+
+    async def parse_single_category(self, category_url: str, force: bool = False):
+        """Парсит одну категорию; force - обойти ее, даже если отпечатки не изменились"""
+
+        try:
+            logger.info(f"Парсинг категории: {category_url}")
+
+            # Подключаемся к MongoDB
+            if self.save:
+                await mongo_client.connect()
 
             # Обрабатываем категорию
-            await self._process_category(category_url)
+            await self._process_category(category_url, force=force)
 
             logger.info("Парсинг категории завершен")
 
         except Exception as e:
             logger.error(f"Ошибка при парсинге категории: {e}")
         finally:
+            self.stats.report()
             await mongo_client.disconnect()
 
-    async def _process_category(self, category_url: str):
-        """Обрабатывает одну категорию"""
+    async def parse_urls(self, urls: Iterable[str]):
+        """Парсит отдельные товары; ссылки читаются из итератора по мере обработки"""
 
         try:
-            # Получаем все страницы категории
-            page_links = await self.category_parser.create_page_links(category_url)
-            logger.info(f"Найдено страниц: {len(page_links)}")
+            # Подключаемся к MongoDB
+            if self.save:
+                await mongo_client.connect()
+
+            products = []
+            for product_url in urls:
+                product = await self._process_product(product_url)
+                if product:
+                    products.append(product)
+                    self.stats.products += 1
+
+                if len(products) >= settings.save_batch_size:
+                    await self._store_products(products)
+                    products = []
+
+                await asyncio.sleep(self.delay_between_requests)
+
+            await self._store_products(products)
+
+            logger.info("Парсинг товаров завершен")
+
+        except Exception as e:
+            logger.error(f"Ошибка при парсинге товаров: {e}")
+        finally:
+            self.stats.report()
+            await mongo_client.disconnect()
+
+    async def _store_products(self, products: List[Product]):
+        """Выводит товары в поток и/или сохраняет их в базу данных"""
+
+        if self.output is not None:
+            for product in products:
+                self.output.write(product.model_dump_json() + '\n')
+            self.output.flush()
 
-            # Обрабатываем каждую страницу
-            for page_num, page_url in enumerate(page_links, 1):
-                logger.info(f"Обработка страницы {page_num}/{len(page_links)}")
+        if self.save:
+            await self.repository.save_products(products)
 
-                # Получаем товары со страницы
-                product_links = await self.category_parser.get_product_links(page_url)
-                logger.info(f"Найдено товаров на странице: {len(product_links)}")
+    async def _iter_categories(self, base_url: str) -> AsyncIterator[str]:
+        """Отдает категории по мере обхода дерева; дерево сохраняется в кеш, как только обход завершен"""
 
-                # Парсим товары со страницы
-                for product_url in product_links:
-                    await self._process_product(product_url)
+        cached = await self.category_tree_repository.load_nodes()
+
+        async def save_tree(tree):
+            await self.category_tree_repository.save_nodes(tree.values())
+
+        async for category_url in self.start_parser.iter_categories(base_url, cached, on_built=save_tree):
+            yield category_url
+
+    async def _discover_categories(self, base_url: str) -> List[str]:
+        """Строит дерево категорий с учетом кеша и сохраняет его"""
+
+        cached = await self.category_tree_repository.load_nodes()
+        tree = await self.start_parser.build_category_tree(base_url, cached)
+        await self.category_tree_repository.save_nodes(tree.values())
+
+        return self.start_parser.leaf_categories(tree)
+
+    async def _process_category(self, category_url: str, force: bool = False):
+        """Обрабатывает одну категорию; при force сверка отпечатков не пропускает ее"""
+
+        try:
+            # Сверяем первые страницы с сохраненными отпечатками (в пробном прогоне обходим всегда)
+            state = await self.category_repository.get_state(category_url) if self.save else None
+            probe_pages = await self._probe_category(category_url)
+            fingerprints = [page.fingerprint for page in probe_pages]
+
+            self.stats.categories += 1
+
+            if not force and self._is_category_unchanged(state, probe_pages):
+                logger.info(f"Категория не изменилась, пропускаем: {category_url}")
+                self.stats.skipped_categories += 1
+                await self.category_repository.mark_checked(category_url)
+                return
+
+            # Были ли страницы или товары, которые не удалось загрузить
+            incomplete = False
+
+            async for page in self._iter_category_pages(category_url, probe_pages):
+                if not page.product_links:
+                    incomplete = True
+
+                # Парсим товары со страницы и сохраняем их одной пачкой
+                products = []
+                for product_url in page.product_links:
+                    product = await self._process_product(product_url)
+                    if product:
+                        products.append(product)
+                    else:
+                        incomplete = True
                     await asyncio.sleep(self.delay_between_requests)
 
+                await self._store_products(products)
+                self.stats.products += len(products)
+                self.stats.check_memory()
+
+            if self.save:
+                # Без отпечатков категория не будет пропущена, и неудавшиеся товары повторятся в следующий раз
+                if incomplete:
+                    logger.info(f"Категория обработана не полностью, отпечатки не сохраняем: {category_url}")
+
+                await self.category_repository.save_state(CategoryState(
+                    url=category_url,
+                    fingerprints=[] if incomplete else fingerprints
+                ))
+
             logger.info("Категория обработана")
 
         except Exception as e:
             logger.error(f"Ошибка при обработке категории {category_url}: {e}")
 
-    async def _process_product(self, product_url: str):
+    async def _iter_category_pages(self, category_url: str, probe_pages: List[ListingPage]) -> AsyncIterator[ListingPage]:
+        """Перебирает страницы категории по мере их обнаружения"""
+
+        # Уже загруженные при сверке страницы не запрашиваем повторно
+        known = {page.url: page for page in probe_pages}
+        page_num = 0
+
+        async for page in self.category_parser.iter_listing_pages(category_url, known):
+            page_num += 1
+            self.stats.pages += 1
+            logger.info("Обработка страницы %d, товаров на странице: %d", page_num, len(page.product_links),
+                        extra={"progress": "страниц"})
+
+            yield page
+
+    async def _probe_category(self, category_url: str) -> List[ListingPage]:
+        """Загружает первые страницы категории для сверки отпечатков"""
+
+        pages = []
+
+        for page_number in range(1, settings.category_probe_pages + 1):
+            page_url = self.category_parser.build_page_url(category_url, page_number)
+            page = await self.category_parser.get_listing_page(page_url)
+
+            # Страница не загрузилась - сверять нечего
+            if page is None:
+                return []
+
+            pages.append(page)
+
+            # Дальше страниц нет: пустая страница или конец видимой пагинации первой страницы
+            if not page.fingerprint or page_number >= pages[0].last_visible_page:
+                break
+
+            await asyncio.sleep(self.delay_between_requests)
+
+        return pages
+
+    def _is_category_unchanged(self, state: Optional[CategoryState], probe_pages: List[ListingPage]) -> bool:
+        """Проверяет, можно ли пропустить категорию"""
+
+        if state is None or not probe_pages or not probe_pages[0].fingerprint:
+            return False
+
+        if [page.fingerprint for page in probe_pages] != state.fingerprints:
+            return False
+
+        # Неизменные категории периодически все равно обходим полностью
+        reverify_after = timedelta(days=settings.category_reverify_days)
+        return datetime.now() - state.verified_at < reverify_after
+
+    async def _process_product(self, product_url: str) -> Optional[Product]:
         """Обрабатывает один товар"""
 
         try:
@@ -107,11 +308,111 @@ class ParserService:
             product = await self.product_parser.parse_product(product_url)
 
             if product:
-                # Сохраняем в базу данных
-                await self.repository.save_product(product)
-                logger.info(f"Сохранен товар: {product.article}")
+                logger.info("Спарсен товар: %s", product.article, extra={"progress": "спарсено"})
             else:
                 logger.warning(f"Не удалось спарсить товар: {product_url}")
 
+            return product
+
         except Exception as e:
             logger.error(f"Ошибка при обработке товара {product_url}: {e}")
+            return None
+
+    async def _daemon_idle_delay(self) -> float:
+        """Сколько ждать до ближайшей задачи в очереди"""
+
+        next_run_at = await self.schedule_repository.next_run_at()
+        if next_run_at is None:
+            return self.daemon_idle_delay
+
+        delay = (next_run_at - datetime.now()).total_seconds()
+        return min(max(delay, 1.0), self.daemon_idle_delay)
+
+    async def _run_schedule_item(self, item: ScheduleItem):
+        """Выполняет задачу из очереди и планирует следующую проверку"""
+
+        try:
+            if item.kind == 'root':
+                signature = await self._recrawl_root(item)
+            elif item.kind == 'category':
+                signature = await self._recrawl_category(item)
+            else:
+                signature = await self._recrawl_product(item)
+        except Exception as e:
+            logger.error(f"Ошибка при переобходе {item.url}: {e}")
+            signature = None
+
+        if signature is None:
+            await self._handle_failed_item(item)
+            return
+
+        changed = bool(item.signature) and signature != item.signature
+        interval = self.scheduler.next_interval(item, changed)
+        await self.schedule_repository.reschedule(item, signature, changed, interval)
+
+        logger.info("Переобход %s %s: %s, следующий через %.1f ч",
+                    item.kind, item.url, 'изменен' if changed else 'без изменений', interval,
+                    extra={"progress": "переобход"})
+
+    async def _handle_failed_item(self, item: ScheduleItem):
+        """Откладывает неудачную проверку, а после нескольких неудач подряд убирает адрес из очереди"""
+
+        failures = item.failures + 1
+
+        # Главная страница - источник категорий, ее не убираем никогда. Удаленные категории и товары
+        # вернутся в очередь сами, если снова появятся на сайте
+        if item.kind != 'root' and failures >= settings.recrawl_max_failures:
+            logger.warning(f"Переобход {item.kind} {item.url} не удался {failures} раз подряд, убираем из очереди")
+            await self.schedule_repository.remove(item.url)
+            return
+
+        interval = self.scheduler.failed_interval(item)
+        await self.schedule_repository.reschedule(item, item.signature, False, interval, failures)
+
+        logger.info(f"Переобход {item.kind} {item.url} не удался ({failures} раз подряд), следующий через {interval:.1f} ч")
+
+    async def _recrawl_root(self, item: ScheduleItem) -> Optional[str]:
+        """Обновляет список категорий и добавляет новые в очередь"""
+
+        categories = await self._discover_categories(item.url)
+        if not categories:
+            return None
+
+        for category_url in categories:
+            await self.schedule_repository.enqueue(category_url, 'category', settings.recrawl_initial_hours)
+
+        return self.scheduler.list_signature(sorted(categories))
+
+    async def _recrawl_category(self, item: ScheduleItem) -> Optional[str]:
+        """Сверяет отпечатки категории и при изменении добавляет ее товары в очередь"""
+
+        probe_pages = await self._probe_category(item.url)
+        if not probe_pages:
+            return None
+
+        fingerprints = [page.fingerprint for page in probe_pages]
+        signature = self.scheduler.list_signature(fingerprints)
+        if signature == item.signature:
+            await self.category_repository.mark_checked(item.url)
+            return signature
+
+        async for page in self._iter_category_pages(item.url, probe_pages):
+            for product_url in page.product_links:
+                await self.schedule_repository.enqueue(product_url, 'product', settings.recrawl_initial_hours)
+
+        await self.category_repository.save_state(CategoryState(
+            url=item.url,
+            fingerprints=fingerprints
+        ))
+
+        return signature
+
+    async def _recrawl_product(self, item: ScheduleItem) -> Optional[str]:
+        """Перепарсивает товар и возвращает отпечаток его цены и наличия"""
+
+        product = await self.product_parser.parse_product(item.url)
+        if not product:
+            return None
+
+        await self.repository.save_product(product)
+        return self.scheduler.product_signature(product)
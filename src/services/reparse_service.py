@@ -0,0 +1,118 @@
+import os
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Tuple
+
+from src.core.settings import settings
+from src.parsers.classifier import PageKind, classify_page
+from src.parsers.product_page import ProductPropertyParser
+from src.repository.mongo_client import mongo_client
+from src.repository.repository import ProductRepository
+from src.scrapers.archive import PageArchive, page_archive
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_chunk(directory: str, entries: List[dict]) -> Tuple[List[dict], List[str]]:
+    """Парсит пачку страниц из архива; выполняется в дочернем процессе.
+
+    Ошибки не логируются здесь, а возвращаются родителю: у дочернего процесса нет
+    потока-слушателя очереди логов.
+    """
+
+    archive = PageArchive(directory)
+    parser = ProductPropertyParser()
+    products = []
+    errors = []
+
+    for entry in entries:
+        page = archive.read(entry)
+        if page is None or classify_page(page) != PageKind.PRODUCT:
+            continue
+
+        try:
+            product = parser.parse_html(page.text, entry['url'])
+        except Exception as e:
+            errors.append(f"Ошибка при перепарсинге {entry['url']}: {e}")
+            continue
+
+        if product:
+            product_dict = product.model_dump()
+            # Время создания - момент загрузки страницы, а не перепарсинга
+            product_dict['created_at'] = (
+                datetime.fromisoformat(entry['fetched_at']).astimezone().strftime("%d.%m.%Y %H:%M")
+            )
+            products.append(product_dict)
+
+    return products, errors
+
+
+class ReparseService:
+    """Прогоняет текущие парсеры по архиву страниц без обращения к сайту"""
+
+    def __init__(self):
+        self.repository = ProductRepository()
+
+    async def reparse_archive(self):
+        """Перепарсивает последнюю версию каждой страницы из архива и обновляет товары"""
+
+        if not page_archive.enabled:
+            logger.error("Архив страниц не настроен (ARCHIVE_DIR)")
+            return
+
+        try:
+            entries = [entry for entry in page_archive.latest_entries().values() if entry['status'] < 400]
+            logger.info(f"Страниц в архиве: {len(entries)}")
+
+            chunk_size = settings.reparse_chunk_size
+            chunks = [entries[i:i + chunk_size] for i in range(0, len(entries), chunk_size)]
+
+            # Подключаемся к MongoDB
+            await mongo_client.connect()
+
+            loop = asyncio.get_running_loop()
+            workers = settings.reparse_workers or os.cpu_count()
+            saved = 0
+
+            # Процессы запускаются через spawn: fork скопировал бы потоки pymongo и
+            # обработчики логов без их слушателя
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                # В работе держим ограниченное окно пачек: готовые результаты не копятся в памяти,
+                # пока идет сохранение в MongoDB
+                pending_chunks = iter(chunks)
+                in_flight = set()
+                done_chunks = 0
+
+                def submit_next():
+                    chunk = next(pending_chunks, None)
+                    if chunk is not None:
+                        in_flight.add(loop.run_in_executor(pool, _parse_chunk, page_archive.directory, chunk))
+
+                for _ in range(workers * 2):
+                    submit_next()
+
+                while in_flight:
+                    finished, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+
+                    for future in finished:
+                        in_flight.discard(future)
+                        submit_next()
+
+                        raw_products, errors = future.result()
+                        for error in errors:
+                            logger.error(error)
+
+                        await self.repository.save_raw_products(raw_products)
+                        saved += len(raw_products)
+                        done_chunks += 1
+                        logger.info(f"Обработано пачек: {done_chunks}/{len(chunks)}, товаров: {saved}")
+
+            logger.info(f"Перепарсинг завершен, товаров: {saved}")
+
+        except Exception as e:
+            logger.error(f"Критическая ошибка при перепарсинге: {e}")
+        finally:
+            await mongo_client.disconnect()
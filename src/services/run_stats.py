@@ -0,0 +1,64 @@
+import sys
+import time
+import logging
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from src.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Пиковое потребление памяти процессом в МиБ"""
+
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux отдает килобайты, macOS - байты
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+class RunStats:
+    """Счетчики прогона и пиковая память относительно бюджета"""
+
+    def __init__(self):
+        self.categories = 0
+        self.skipped_categories = 0
+        self.pages = 0
+        self.products = 0
+        self.started = time.monotonic()
+        self._budget_exceeded = False
+
+    def check_memory(self):
+        """Один раз предупреждает, если пиковая память вышла за бюджет"""
+
+        peak = peak_rss_mb()
+        if peak is None or settings.memory_budget_mb <= 0 or self._budget_exceeded:
+            return
+
+        if peak > settings.memory_budget_mb:
+            self._budget_exceeded = True
+            logger.warning(f"Пиковая память {peak:.0f} МиБ превысила бюджет {settings.memory_budget_mb:.0f} МиБ")
+
+    def report(self):
+        """Выводит итоги прогона"""
+
+        self.check_memory()
+
+        peak = peak_rss_mb()
+        memory = "нет данных" if peak is None else f"{peak:.0f} МиБ"
+        if settings.memory_budget_mb > 0:
+            memory += f" (бюджет {settings.memory_budget_mb:.0f} МиБ{', превышен' if self._budget_exceeded else ''})"
+
+        logger.info(f"Итоги: категорий {self.categories} (без изменений {self.skipped_categories}), "
+                    f"страниц {self.pages}, товаров {self.products}, "
+                    f"время {time.monotonic() - self.started:.0f} с, пиковая память {memory}")
@@ -0,0 +1,47 @@
+import hashlib
+from typing import Iterable
+
+from src.core.settings import settings
+from src.schemas.product import Product
+from src.schemas.schedule import ScheduleItem
+
+
+class RecrawlScheduler:
+    """Подбирает интервал переобхода по тому, как часто меняется страница"""
+
+    # Во сколько раз сокращаем интервал при изменении и растягиваем без изменений
+    speedup = 2.0
+    slowdown = 1.5
+
+    def next_interval(self, item: ScheduleItem, changed: bool) -> float:
+        """Возвращает новый интервал переобхода в часах"""
+
+        if changed:
+            interval = item.interval_hours / self.speedup
+        else:
+            interval = item.interval_hours * self.slowdown
+
+        return min(max(interval, settings.recrawl_min_hours), settings.recrawl_max_hours)
+
+    def failed_interval(self, item: ScheduleItem) -> float:
+        """Интервал после неудачной проверки: растягиваем, чтобы мертвые адреса не тратили лимит запросов"""
+
+        return min(max(item.interval_hours * self.slowdown, settings.recrawl_min_hours), settings.recrawl_max_hours)
+
+    @staticmethod
+    def product_signature(product: Product) -> str:
+        """Отпечаток цены и наличия товара"""
+
+        parts = []
+        for supplier in product.suppliers:
+            for offer in supplier.supplier_offers:
+                prices = ','.join(f"{info.qnt}:{info.price}" for info in offer.price)
+                parts.append(f"{prices}|{offer.stock}")
+
+        return hashlib.sha1(';'.join(parts).encode()).hexdigest()
+
+    @staticmethod
+    def list_signature(values: Iterable[str]) -> str:
+        """Отпечаток набора строк (ссылок категорий или отпечатков страниц)"""
+
+        return hashlib.sha1('\n'.join(values).encode()).hexdigest()